@@ -0,0 +1,293 @@
+#!/usr/bin/env python
+
+import argparse
+from fractions import Fraction
+import numpy as np
+import ghostAgents
+from layout import Layout
+from game import Directions
+
+# largest recurrent class whose hitting times are computed with dense linear algebra
+DENSE_STATES = 4000
+
+
+class GhostChain:
+    """
+    Markov chain of a random ghost over (location, direction) pairs, with the
+    same transitions as the CONNECTED_GHOST facts of the generated problem.
+    Only the states reachable from the start states of the ghosts are kept.
+    Each state has few successors, so the sparse transition matrix is stored
+    as arrays of shape (states, max successors), padded with probability 0.
+    """
+
+    def __init__(self, layout : Layout):
+        self.layout = layout
+        self.positions = layout.getReachablePositions()
+        index = {pos: i for i, pos in enumerate(self.positions)}
+        ghost = ghostAgents.RandomGhost()
+
+        # ghosts start looking in no direction, as in the initial state
+        starts = [(pos, Directions.STOP) for is_pacman, pos in layout.agentPositions if not is_pacman]
+        assert starts, "the layout has no ghosts"
+        self.states = list(dict.fromkeys(starts))
+        state_index = {state: i for i, state in enumerate(self.states)}
+        transitions = []
+        for position, dir in self.states:
+            successors = layout.getSuccessors(position)
+            dist = ghost.getDistribution(layout, position, dir, False, None)
+            transitions.append([])
+            for act, prob in dist.items():
+                state = (layout.legalPositions[successors[act]], act)
+                if state not in state_index:
+                    state_index[state] = len(self.states)
+                    self.states.append(state)
+                transitions[-1].append((state_index[state], float(Fraction(prob))))
+
+        self.num_states = len(self.states)
+        self.starts = np.array([state_index[state] for state in starts], dtype=np.int64)
+        self.cells = np.array([index[pos] for pos, dir in self.states], dtype=np.int64)
+        self.successors, self.probs = self._pad(transitions)
+        predecessors = [[] for _ in self.states]
+        for i, row in enumerate(transitions):
+            for j, prob in row:
+                predecessors[j].append((i, prob))
+        self.predecessors, self.predecessor_probs = self._pad(predecessors)
+
+    def _pad(self, rows):
+        width = max(1, max(map(len, rows), default=0))
+        indices = np.zeros((len(rows), width), dtype=np.int64)
+        probs = np.zeros((len(rows), width))
+        for i, row in enumerate(rows):
+            for k, (j, prob) in enumerate(row):
+                indices[i, k], probs[i, k] = j, prob
+        return indices, probs
+
+    @staticmethod
+    def _multiply(x, indices, probs):
+        # sums probs * x[indices] over the padded entries, for all columns of x
+        result = np.zeros(x.shape)
+        for k in range(indices.shape[1]):
+            result += probs[:, k, None] * x[indices[:, k]]
+        return result
+
+    def step(self, x):
+        """ Distributions over states (one per column) after one move. """
+        return self._multiply(x, self.predecessors, self.predecessor_probs)
+
+    def expect(self, h):
+        """ Expected values of h (one per column) after one move. """
+        return self._multiply(h, self.successors, self.probs)
+
+    def cell_occupancy(self, x):
+        """ Sums distributions over states into distributions over positions. """
+        occupancy = np.zeros((len(self.positions), x.shape[1]))
+        np.add.at(occupancy, self.cells, x)
+        return occupancy
+
+    def start_distributions(self):
+        x = np.zeros((self.num_states, len(self.starts)))
+        x[self.starts, np.arange(len(self.starts))] = 1
+        return x
+
+    def stationary(self, tol=1e-10, max_iterations=100000):
+        """
+        Stationary occupancy of each position, reached from the start states
+        of the ghosts. Maze graphs are often bipartite, so the iteration runs
+        on the lazy chain (P + I) / 2, which has the same stationary
+        distribution but is aperiodic.
+        """
+        x = self.start_distributions().mean(axis=1, keepdims=True)
+        for _ in range(max_iterations):
+            new_x = (x + self.step(x)) / 2
+            converged = np.abs(new_x - x).max() < tol
+            x = new_x
+            if converged:
+                break
+        return self.cell_occupancy(x)[:, 0]
+
+    def hitting_times(self, cells, tol=1e-6, max_iterations=100000):
+        """
+        Expected number of moves until each ghost (one row per ghost) first
+        enters each of the given positions (one column per position), or
+        infinity if it cannot reach the position.
+
+        If all states but the start states form a single recurrent class of
+        at most DENSE_STATES states, the hitting times follow from its
+        fundamental matrix Z = (I - P + 1 pi)^-1 with a tiny linear system per
+        position. Otherwise, h = 1 + P h is iterated, which needs about as
+        many iterations as the longest hitting times are long.
+        """
+        index = {pos: i for i, pos in enumerate(self.positions)}
+        targets = np.array([index[pos] for pos in cells], dtype=np.int64)
+        hit = self.cells[:, None] == targets[None, :]
+        recurrent = np.ones(self.num_states, dtype=bool)
+        recurrent[self.starts] = False
+        if 0 < recurrent.sum() <= DENSE_STATES and self._is_strongly_connected(recurrent):
+            h = self._fundamental_hitting_times(recurrent, hit)
+        else:
+            h = self._iterate_hitting_times(hit, tol, max_iterations)
+        return h[self.starts]
+
+    def _is_strongly_connected(self, states):
+        first = np.flatnonzero(states)[:1]
+        for edges, probs in [(self.successors, self.probs), (self.predecessors, self.predecessor_probs)]:
+            reached = np.zeros(self.num_states, dtype=bool)
+            reached[first] = True
+            queue = list(first)
+            for i in queue:
+                for j in edges[i][probs[i] > 0]:
+                    if states[j] and not reached[j]:
+                        reached[j] = True
+                        queue.append(j)
+            if (reached != states).any():
+                return False
+        return True
+
+    def _fundamental_hitting_times(self, recurrent, hit):
+        states = np.flatnonzero(recurrent)
+        n = len(states)
+        local = np.zeros(self.num_states, dtype=np.int64)
+        local[states] = np.arange(n)
+        transition = np.zeros((n, n))
+        rows = np.repeat(np.arange(n), self.successors.shape[1])
+        np.add.at(transition, (rows, local[self.successors[states].ravel()]), self.probs[states].ravel())
+        stationary = np.linalg.solve((np.eye(n) - transition + 1).T, np.ones(n))
+        fundamental = np.linalg.inv(np.eye(n) - transition + stationary[None, :])
+
+        # the states C of each position, one per direction the ghost may look
+        # at, padded with coefficients fixed to 0
+        hit_states = [np.flatnonzero(column) for column in hit[states].T]
+        width = max(1, max(map(len, hit_states)))
+        padded = np.zeros((len(hit_states), width), dtype=np.int64)
+        valid = np.zeros((len(hit_states), width), dtype=bool)
+        for t, c in enumerate(hit_states):
+            padded[t, :len(c)] = c
+            valid[t, :len(c)] = True
+        reachable = valid.any(axis=1)
+
+        # h = beta - Z[:, C] u, where h = 0 on C and pi[C] u = 1
+        both = valid[:, :, None] & valid[:, None, :]
+        systems = np.zeros((len(hit_states), width + 1, width + 1))
+        systems[:, :width, 0] = valid
+        systems[:, :width, 1:] = np.where(both, -fundamental[padded[:, :, None], padded[:, None, :]], 0)
+        systems[:, :width, 1:] += np.eye(width) * ~valid[:, :, None]
+        systems[:, width, 1:] = np.where(valid, stationary[padded], 0)
+        systems[~reachable] = np.eye(width + 1)
+        rhs = np.zeros((len(hit_states), width + 1, 1))
+        rhs[:, width] = 1
+        solution = np.linalg.solve(systems, rhs)[:, :, 0]
+        beta, u = solution[:, 0], solution[:, 1:]
+
+        h = np.zeros(hit.shape)
+        h[states] = beta[None, :] - np.einsum("ntk,tk->nt", fundamental[:, padded], u)
+        h[:, ~reachable] = np.inf
+        # the start states enter the recurrent class with their first move
+        starts = np.flatnonzero(~recurrent)
+        finite = np.where(reachable, h, 0)
+        h[starts] = np.where(hit[starts], 0, np.where(reachable, 1 + self.expect(finite)[starts], np.inf))
+        return h
+
+    def _iterate_hitting_times(self, hit, tol, max_iterations):
+        # states from which the position can be reached at all
+        edges = (self.probs > 0).astype(float)
+        reaches = hit
+        while True:
+            new_reaches = reaches | (self._multiply(reaches, self.successors, edges) > 0)
+            if (new_reaches == reaches).all():
+                break
+            reaches = new_reaches
+        active = reaches & ~hit
+
+        h = np.zeros(hit.shape)
+        for _ in range(max_iterations):
+            new_h = np.where(active, 1 + self.expect(h), 0)
+            converged = np.abs(new_h - h).max() <= tol * max(1, new_h.max())
+            h = new_h
+            if converged:
+                break
+        h[~reaches] = np.inf
+        return h
+
+    def danger(self, horizon):
+        """
+        Probability that at least one ghost is at each position, averaged
+        over the first horizon moves of the ghosts.
+        """
+        x = self.start_distributions()
+        danger = np.zeros(len(self.positions))
+        for _ in range(horizon):
+            x = self.step(x)
+            danger += 1 - np.prod(1 - self.cell_occupancy(x), axis=1)
+        return danger / horizon
+
+
+def analyze(layout : Layout, horizon : int):
+    """
+    Summarizes how dangerous the ghosts of a layout are for its food:
+    the expected number of ghosts on food cells in the long run, the
+    expected number of moves until the closest ghost enters each food cell,
+    and the danger of the food cells within the horizon.
+    """
+    chain = GhostChain(layout)
+    food = [pos for pos in chain.positions if layout.isFood(pos)]
+    is_food = np.array([layout.isFood(pos) for pos in chain.positions], dtype=bool)
+    stationary = chain.stationary()
+    danger = chain.danger(horizon)
+    if len(food) and len(chain.starts):
+        hitting = chain.hitting_times(food).min(axis=0)
+        hitting = hitting[np.isfinite(hitting)]
+    else:
+        hitting = np.zeros(0)
+    return {
+        "cells": len(chain.positions),
+        "ghosts": len(chain.starts),
+        "food": len(food),
+        "food occupancy": len(chain.starts) * stationary[is_food].sum(),
+        "min hitting time": hitting.min() if len(hitting) else np.inf,
+        "mean hitting time": hitting.mean() if len(hitting) else np.inf,
+        "mean food danger": danger[is_food].mean() if len(food) else 0,
+        "max food danger": danger[is_food].max() if len(food) else 0,
+    }, chain, danger
+
+
+def danger_map(layout : Layout, chain : GhostChain, danger):
+    """
+    Renders the layout with the danger of each reachable cell as a digit,
+    from 0 (no ghost within the horizon) to 9 (the most dangerous cell).
+    """
+    rows = [list(row) for row in layout.layoutText]
+    scale = danger.max() if len(danger) and danger.max() > 0 else 1
+    for (x, y), value in zip(chain.positions, danger):
+        rows[layout.height - 1 - y][x] = str(min(9, int(10 * value / scale)))
+    return "\n".join("".join(row) for row in rows)
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("layouts", type=str, nargs="+", help="Layout files")
+    p.add_argument("--horizon", type=int, default=50, help="number of ghost moves over which the danger of a cell is averaged")
+    p.add_argument("--map", action="store_true", help="print the danger map of each layout")
+    args = p.parse_args()
+
+    results = []
+    for path in args.layouts:
+        with open(path) as f:
+            layout = Layout(f.read().splitlines())
+        summary, chain, danger = analyze(layout, args.horizon)
+        results.append((path, summary))
+        if args.map:
+            print(path)
+            print(danger_map(layout, chain, danger))
+            print()
+
+    # the most dangerous instances first
+    results.sort(key=lambda x: x[1]["mean food danger"], reverse=True)
+    columns = list(results[0][1])
+    print(f"| layout | {' | '.join(columns)} |")
+    print("|---" * (len(columns) + 1) + "|")
+    for path, summary in results:
+        values = [f"{v:.3f}" if isinstance(v, float) else str(v) for v in summary.values()]
+        print(f"| {path} | {' | '.join(values)} |")
+
+if __name__ == "__main__":
+    main()
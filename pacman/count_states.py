@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+
+import argparse
+from collections import defaultdict
+import itertools
+import time
+
+
+def parse(text: str) -> list:
+    """
+    Returns the nested lists of the tokens of a PDDL file.
+    """
+    stack = [[]]
+    for line in text.lower().splitlines():
+        line = line.split(";")[0]
+        for token in line.replace("(", " ( ").replace(")", " ) ").split():
+            if token == "(":
+                stack.append([])
+            elif token == ")":
+                expr = stack.pop()
+                stack[-1].append(expr)
+            else:
+                stack[-1].append(token)
+    return stack[0][0]
+
+def typed(items : list) -> list:
+    # (name, type) of a typed list such as ?x ?y - location ?n - agent
+    result, names = [], []
+    i = 0
+    while i < len(items):
+        if items[i] == "-":
+            result += [(name, items[i + 1]) for name in names]
+            names = []
+            i += 2
+        else:
+            names.append(items[i])
+            i += 1
+    return result + [(name, "object") for name in names]
+
+def literals(expr : list) -> list:
+    # (positive, atom) of a conjunction of literals
+    if not expr:
+        return []
+    if expr[0] == "and":
+        return [literal for part in expr[1:] for literal in literals(part)]
+    if expr[0] == "not":
+        return [(False, tuple(expr[1]))]
+    return [(True, tuple(expr))]
+
+def outcomes(effect : list) -> list:
+    # (added atoms, deleted atoms) of each outcome of an effect, ignoring costs
+    result = [(set(), set())]
+    for part in effect[1:] if effect[0] == "and" else [effect]:
+        if part[0] == "increase":
+            continue
+        if part[0] == "probabilistic":
+            branches = [outcomes(part[i + 1]) for i in range(1, len(part), 2)]
+            result = [(add | a, delete | d) for add, delete in result for branch in branches for a, d in branch]
+        else:
+            for positive, atom in literals(part):
+                for add, delete in result:
+                    (add if positive else delete).add(atom)
+    return result
+
+class Task:
+    """
+    The ground actions of a PDDL task of generate.py, grounded against the
+    static facts, and its reachable states.
+    """
+
+    def __init__(self, domain : str, problem : str):
+        domain, problem = parse(domain), parse(problem)
+        sections = defaultdict(list)
+        for part in domain[2:] + problem[2:]:
+            if part[0] != ":action":
+                sections[part[0]] += part[1:]
+        supertypes = dict(typed(sections[":types"]))
+        self.objects = defaultdict(list)
+        for name, type in typed(sections[":constants"]) + typed(sections[":objects"]):
+            while type in supertypes:
+                self.objects[type].append(name)
+                type = supertypes[type]
+            self.objects[type].append(name)
+        schemas = [part for part in domain[2:] if part[0] == ":action"]
+        fluents = {atom[0] for schema in schemas
+                   for add, delete in outcomes(schema[schema.index(":effect") + 1])
+                   for atom in add | delete}
+        init = [tuple(atom) for atom in sections[":init"] if atom[0] != "="]
+        self.static = defaultdict(set)
+        for atom in init:
+            if atom[0] not in fluents:
+                self.static[atom[0]].add(atom)
+        self.init = frozenset(atom for atom in init if atom[0] in fluents)
+        self.goal = [atom for _, atom in literals(sections[":goal"][0])]
+        # (name, positive and negative fluent preconditions, outcomes)
+        self.actions = [action for schema in schemas for action in self.ground(schema, fluents)]
+
+    def ground(self, schema : list, fluents : set):
+        parameters = typed(schema[schema.index(":parameters") + 1])
+        precondition = literals(schema[schema.index(":precondition") + 1])
+        effect = outcomes(schema[schema.index(":effect") + 1])
+        static = [atom for positive, atom in precondition if positive and atom[0] not in fluents and atom[0] != "="]
+        checks = [(positive, atom) for positive, atom in precondition if atom[0] == "=" or (atom[0] not in fluents and not positive)]
+        dynamic = [(positive, atom) for positive, atom in precondition if atom[0] in fluents]
+
+        def match(atoms, binding):
+            # bindings of the parameters that satisfy the static atoms
+            if not atoms:
+                yield binding
+                return
+            atom = atoms[0]
+            for fact in self.static[atom[0]]:
+                extended = dict(binding)
+                if all(extended.setdefault(term, value) == value if term.startswith("?") else term == value
+                       for term, value in zip(atom[1:], fact[1:])):
+                    yield from match(atoms[1:], extended)
+
+        def substitute(atom, binding):
+            return tuple(binding.get(term, term) for term in atom)
+
+        for partial in match(static, {}):
+            if any(name in partial and partial[name] not in self.objects[type] for name, type in parameters):
+                continue
+            free = [(name, type) for name, type in parameters if name not in partial]
+            for values in itertools.product(*(self.objects[type] for _, type in free)):
+                binding = dict(partial, **dict(zip((name for name, _ in free), values)))
+                if all((substitute(atom, binding)[1] == substitute(atom, binding)[2] if atom[0] == "="
+                        else substitute(atom, binding) in self.static[atom[0]]) == positive
+                       for positive, atom in checks):
+                    pre = [atom for positive, atom in dynamic if positive]
+                    neg = [atom for positive, atom in dynamic if not positive]
+                    yield (schema[1],
+                           [substitute(atom, binding) for atom in pre],
+                           [substitute(atom, binding) for atom in neg],
+                           [(frozenset(substitute(atom, binding) for atom in add),
+                             frozenset(substitute(atom, binding) for atom in delete))
+                            for add, delete in effect])
+
+    def reachable_states(self) -> int:
+        """
+        Returns the number of states reachable from the initial state,
+        without expanding goal states.
+        """
+        # each action is only tried in states with its rarest precondition
+        frequency = defaultdict(int)
+        for _, pre, _, _ in self.actions:
+            for atom in pre:
+                frequency[atom] += 1
+        index = defaultdict(list)
+        for action in self.actions:
+            index[min(action[1], key=frequency.__getitem__)].append(action)
+        seen = {self.init}
+        queue = [self.init]
+        for state in queue:
+            if all(atom in state for atom in self.goal):
+                continue
+            for atom in state:
+                for _, pre, neg, effects in index[atom]:
+                    if all(a in state for a in pre) and not any(a in state for a in neg):
+                        for add, delete in effects:
+                            successor = (state - delete) | add
+                            if successor not in seen:
+                                seen.add(successor)
+                                queue.append(successor)
+        return len(seen)
+
+def main():
+    p = argparse.ArgumentParser(description="Counts the reachable states of a problem of generate.py by breadth-first search. Only feasible for small layouts with little food.")
+    p.add_argument("domain", type=str, help="Domain file")
+    p.add_argument("problem", type=str, help="Problem file")
+    args = p.parse_args()
+
+    with open(args.domain) as f, open(args.problem) as g:
+        start = time.perf_counter()
+        task = Task(f.read(), g.read())
+    print(f"{len(task.actions)} ground actions")
+    states = task.reachable_states()
+    print(f"{states} reachable states ({time.perf_counter() - start:.1f}s)")
+
+if __name__ == "__main__":
+    main()
@@ -20,6 +20,9 @@
 # John DeNero (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
 # For more info, see http://inst.eecs.berkeley.edu/~cs188/sp09/pacman.html
 
+import re
+
+
 class Directions:
     NORTH = 'North'
     SOUTH = 'South'
@@ -139,11 +142,37 @@ class AgentState:
         return self.configuration.getDirection()
 
 
+class GridColumn:
+    """
+    A view on the column x of a Grid, so that cells can be accessed via
+    grid[x][y] as with a list of lists.
+    """
+
+    def __init__(self, grid, x):
+        self.grid = grid
+        self.x = x
+
+    def __getitem__(self, y):
+        return self.grid[self.x, y]
+
+    def __setitem__(self, y, item):
+        self.grid[self.x, y] = item
+
+    def __len__(self):
+        return self.grid.height
+
+    def __iter__(self):
+        for y in range(self.grid.height):
+            yield self.grid[self.x, y]
+
+
 class Grid:
     """
-    A 2-dimensional array of objects backed by a list of lists.  Data is accessed
-    via grid[x][y] where (x,y) are positions on a Pacman map with x horizontal,
-    y vertical and the origin (0,0) in the bottom left corner.
+    A 2-dimensional array of booleans backed by a bitset.  Data is accessed
+    via grid[x][y] or grid[x, y] where (x,y) are positions on a Pacman map with
+    x horizontal, y vertical and the origin (0,0) in the bottom left corner.
+
+    Cell (x,y) is stored in bit x * height + y of the bytearray data.
 
     The __str__ method constructs an output that is oriented like a pacman board.
     """
@@ -155,19 +184,59 @@ class Grid:
 
         self.width = width
         self.height = height
-        self.data = [[initialValue for y in range(
-            height)] for x in range(width)]
+        size = (width * height + 7) // 8
+        if initialValue:
+            self.data = bytearray(b'\xff' * size)
+            self._clearPadding()
+        else:
+            self.data = bytearray(size)
         if bitRepresentation:
             self._unpackBits(bitRepresentation)
 
+    def _clearPadding(self):
+        extra = len(self.data) * 8 - self.width * self.height
+        if extra:
+            self.data[-1] &= 0xff >> extra
+
+    def _cellIndex(self, x, y):
+        if x < 0:
+            x += self.width
+        if y < 0:
+            y += self.height
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            raise IndexError('grid index out of range')
+        return x * self.height + y
+
     def __getitem__(self, i):
-        return self.data[i]
+        if isinstance(i, tuple):
+            index = self._cellIndex(*i)
+            return (self.data[index >> 3] >> (index & 7)) & 1 == 1
+        if i < 0:
+            i += self.width
+        if not 0 <= i < self.width:
+            raise IndexError('grid index out of range')
+        return GridColumn(self, i)
 
     def __setitem__(self, key, item):
-        self.data[key] = item
+        if isinstance(key, tuple):
+            index = self._cellIndex(*key)
+            if item:
+                self.data[index >> 3] |= 1 << (index & 7)
+            else:
+                self.data[index >> 3] &= ~(1 << (index & 7)) & 0xff
+        else:
+            for y, value in enumerate(item):
+                self[key, y] = value
+
+    def _asInt(self):
+        return int.from_bytes(self.data, 'little')
+
+    def _asBitString(self):
+        """Returns a string whose i-th character is the value ('0' or '1') of cell i"""
+        return format(self._asInt(), f'0{len(self.data) * 8}b')[::-1][:self.width * self.height]
 
     def __str__(self):
-        out = [[str(self.data[x][y])[0] for x in range(self.width)]
+        out = [[str(self[x, y])[0] for x in range(self.width)]
                for y in range(self.height)]
         out.reverse()
         return '\n'.join([''.join(x) for x in out])
@@ -175,22 +244,15 @@ class Grid:
     def __eq__(self, other):
         if other == None:
             return False
-        return self.data == other.data
+        return (self.width, self.height, self.data) == (other.width, other.height, other.data)
 
     def __hash__(self):
-        # return hash(str(self))
-        base = 1
-        h = 0
-        for l in self.data:
-            for i in l:
-                if i:
-                    h += base
-                base *= 2
-        return hash(h)
+        # same value as summing 2 ** (x * height + y) over all true cells
+        return hash(self._asInt())
 
     def copy(self):
         g = Grid(self.width, self.height)
-        g.data = [x[:] for x in self.data]
+        g.data = bytearray(self.data)
         return g
 
     def deepCopy(self):
@@ -202,14 +264,17 @@ class Grid:
         return g
 
     def count(self, item=True):
-        return sum([x.count(item) for x in self.data])
+        ones = self._asInt().bit_count()
+        return ones if item else self.width * self.height - ones
 
     def asList(self, key=True):
+        bits = self._asBitString()
+        char = '1' if key else '0'
         list = []
-        for x in range(self.width):
-            for y in range(self.height):
-                if self[x][y] == key:
-                    list.append((x, y))
+        i = bits.find(char)
+        while i >= 0:
+            list.append(divmod(i, self.height))
+            i = bits.find(char, i + 1)
         return list
 
     def packBits(self):
@@ -219,20 +284,16 @@ class Grid:
         (width, height, bitPackedInts...)
         """
         bits = [self.width, self.height]
-        currentInt = 0
-        for i in range(self.height * self.width):
-            bit = self.CELLS_PER_INT - (i % self.CELLS_PER_INT) - 1
-            x, y = self._cellIndexToPosition(i)
-            if self[x][y]:
-                currentInt += 2 ** bit
-            if (i + 1) % self.CELLS_PER_INT == 0:
-                bits.append(currentInt)
-                currentInt = 0
-        bits.append(currentInt)
+        cells = self._asBitString()
+        for i in range(0, len(cells), self.CELLS_PER_INT):
+            chunk = cells[i:i + self.CELLS_PER_INT]
+            bits.append(int(chunk.ljust(self.CELLS_PER_INT, '0'), 2))
+        if len(cells) % self.CELLS_PER_INT == 0:
+            bits.append(0)
         return tuple(bits)
 
     def _cellIndexToPosition(self, index):
-        x = index / self.height
+        x = index // self.height
         y = index % self.height
         return x, y
 
@@ -246,21 +307,25 @@ class Grid:
                 if cell == self.width * self.height:
                     break
                 x, y = self._cellIndexToPosition(cell)
-                self[x][y] = bit
+                self[x, y] = bit
                 cell += 1
 
     def _unpackInt(self, packed, size):
-        bools = []
         if packed < 0:
             raise ValueError("must be a positive integer")
-        for i in range(size):
-            n = 2 ** (self.CELLS_PER_INT - i - 1)
-            if packed >= n:
-                bools.append(True)
-                packed -= n
-            else:
-                bools.append(False)
-        return bools
+        return [c == '1' for c in format(packed, f'0{self.CELLS_PER_INT}b')[-size:]]
+
+
+def gridFromString(width, height, cells, key):
+    """
+    Builds a Grid from a string with one character per cell, ordered by
+    x * height + y, whose cells are true where the character is key.
+    """
+    g = Grid(width, height)
+    bits = re.sub('[^' + re.escape(key) + ']', '0', cells).replace(key, '1')
+    if bits:
+        g.data = bytearray(int(bits[::-1], 2).to_bytes(len(g.data), 'little'))
+    return g
 
 
 def reconstituteGrid(bitRep):
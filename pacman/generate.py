@@ -2,11 +2,25 @@
 
 import argparse
 from collections import defaultdict
+import hashlib
+import json
+import math
+import os
 import random
 import ghostAgents
 from layout import Layout
 from game import Directions, Actions
 
+# bump whenever the output of compile_layout changes, to invalidate old caches
+CACHE_VERSION = 2
+
+GHOST_ENCODINGS = ["connected", "slots"]
+# static facts of the ghost moves that each ghost encoding emits
+GHOST_FACTS = {
+    "connected": ["CONNECTED_GHOST_"],
+    "slots": ["GHOST_DIST_", "SUCCESSOR", "SLOT_LOCATION"],
+}
+
 def backslash_join (x, tab = 0):
 
     return "\n".join([(' '*tab) + y for y in x])
@@ -14,6 +28,9 @@ def backslash_join (x, tab = 0):
 def loc_name(x):
     return f"loc-{int(x[0])}-{int(x[1])}"
 
+def slot_name(position, dir):
+    return f"slot-{int(position[0])}-{int(position[1])}-{dir}"
+
 def get_probabilistic_effect (effects, tab):
     if len(effects) == 1:
         return " "*tab + effects[0][1]
@@ -21,48 +38,118 @@ def get_probabilistic_effect (effects, tab):
             + backslash_join([f"{prob} {effect}" for (prob, effect) in effects], tab=tab+4) +
             '\n' + " "*tab + ")")
 
-def generate(
+def get_agent_name(i, is_pacman):
+    if is_pacman:
+        return f"pacman{i}" if i > 0 else "pacman"
+    return f"ghost{i}"
+
+def reachable_ghost_states(layout : Layout, starts : list = None) -> set:
+    """
+    Returns the (location, direction) pairs a ghost can reach from the given
+    start positions (by default, those of all ghosts), where it looks in no
+    direction. A ghost looks in the direction of its last move, so for
+    example a ghost in a horizontal corridor never looks north or south.
+    """
+    if starts is None:
+        starts = [position for is_pacman, position in layout.agentPositions if not is_pacman]
+    states = {(position, Directions.STOP) for position in starts}
+    queue = list(states)
+    for position, dir in queue:
+        successors = layout.getSuccessors(position)
+        for act in ghostAgents.getLegalActions(layout, position, dir):
+            state = (layout.legalPositions[successors[act]], act)
+            if state not in states:
+                states.add(state)
+                queue.append(state)
+    return states
+
+def compile_layout(
         layout : Layout,
-        sampled_food : int,
-        target_points : int
-) -> (str, str):
+        ghost_model : str,
+        prob_attack : float,
+        prune_ghost_states : bool = False,
+        ghost_encoding : str = "connected"
+) -> dict:
+    """
+    Renders the parts of the PDDL files that only depend on the layout and
+    the ghost model: the location objects, the CONNECTED_PACMAN and
+    CONNECTED_GHOST facts, and the move-ghost schemas with their predicates.
+    If prune_ghost_states is set, CONNECTED_GHOST facts are only rendered for
+    the reachable_ghost_states.
+
+    With the "connected" ghost encoding, each move-ghost schema has a
+    location and a direction parameter per outcome. With the "slots"
+    encoding, the ghost is in a slot object per (location, direction) pair
+    instead. Move-ghost schemas only choose the index of the outcome, and a
+    single apply-ghost-move schema looks up the successor slot of the index,
+    so that no schema has more than 6 parameters.
+    """
+    assert ghost_encoding in GHOST_ENCODINGS
 
     CONNECTED_GHOST_PREDICATES = []
     MOVE_GHOST_ACTIONS = []
     OBJECTS = []
     INITIAL_STATE = []
-    GOAL = []
-    
-    positions = layout.getLegalPositions()
-    ghostAgent = ghostAgents.RandomGhost()
+
+    # successors refer to positions by their index among all legal positions,
+    # but only positions reachable by some agent are part of the problem
+    names = [loc_name(position) for position in layout.getLegalPositions()]
+    positions = layout.getReachablePositions()
+    if ghost_model == "directional":
+        # the ghost's move depends on the position of pacman, which therefore
+        # becomes the first argument of the CONNECTED_GHOST predicates
+        ghostAgent = ghostAgents.DirectionalGhost(1, prob_attack=prob_attack)
+        pacman_positions = positions
+    else:
+        assert ghost_model == "random"
+        ghostAgent = ghostAgents.RandomGhost()
+        pacman_positions = [None]
 
     probability_distributions = set()
     sources_to_distributions = defaultdict(list)
     sources_to_targets = defaultdict(list)
+    slot_successors = {}
 
     directions = [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST, Directions.STOP]
+    ghost_states = reachable_ghost_states(layout) if prune_ghost_states else None
 
     OBJECTS.append(" ".join(directions) + " - direction")
     OBJECTS.append(" ".join(map(loc_name, positions)) + " - location")
 
     for position in positions:
         #INITIAL_STATE.append(f"(CONNECTED_PACMAN {loc_name(position)} {loc_name(position)})")
+        index = layout.getPositionIndex(position)
+        successors = layout.getSuccessors(position)
 
         for dir in directions:
-            dist = ghostAgent.getDistribution(layout, position, dir)
-            sorted_dist = sorted(dist.items(), key=lambda x: x[1], reverse=True)
-            dist_probabilities = tuple(list([prob for (act, prob) in sorted_dist]))
-            sources_to_distributions[(position, dir)] = dist_probabilities
-
-            if Actions.getSuccessor(position, dir) in positions:
-                INITIAL_STATE.append(f"(CONNECTED_PACMAN {loc_name(position)} {loc_name(Actions.getSuccessor(position, dir))})")
-
-            Actions.getSuccessor(position, dir)
-
-            probability_distributions.add(dist_probabilities)
-            for (act, prob) in sorted_dist:
-                new_pos = Actions.getSuccessor(position, act)
-                sources_to_targets[(position, dir)].append((new_pos, act))
+            if dir in successors:
+                INITIAL_STATE.append(f"(CONNECTED_PACMAN {names[index]} {names[successors[dir]]})")
+
+            if ghost_states is not None and (position, dir) not in ghost_states:
+                continue
+            for pacman_position in pacman_positions:
+                if pacman_position == position:
+                    # move-ghost requires pacman and the ghost to be apart
+                    continue
+                # probabilities are normalized fractions, so distributions with
+                # the same sorted probabilities share one move-ghost schema
+                dist = ghostAgent.getDistribution(layout, position, dir, False, pacman_position)
+                if ghost_encoding == "slots":
+                    # outcomes keep the order of the legal actions, so that
+                    # the successor slot of an outcome does not depend on
+                    # the position of pacman
+                    sorted_dist = [(act, dist[act]) for act in ghostAgents.getLegalActions(layout, position, dir)]
+                else:
+                    sorted_dist = sorted(dist.items(), key=lambda x: x[1], reverse=True)
+                dist_probabilities = tuple(list([prob for (act, prob) in sorted_dist]))
+                source = (pacman_position, position, dir)
+                sources_to_distributions[source] = dist_probabilities
+
+                probability_distributions.add(dist_probabilities)
+                for (act, prob) in sorted_dist:
+                    new_pos = layout.legalPositions[successors[act]]
+                    sources_to_targets[source].append((new_pos, act))
+                slot_successors[(position, dir)] = sources_to_targets[source]
 
 
     probability_distributions_by_id = {id : prob_dist for id, prob_dist in enumerate(sorted(probability_distributions, reverse=True), start=1)}
@@ -70,6 +157,23 @@ def generate(
 
     sources_to_distribution_ids = {src : id_map [prob] for (src, prob) in sources_to_distributions.items()}
 
+    num_ghosts = sum(1 for is_pacman, position in layout.agentPositions if not is_pacman)
+    num_pacman = len(layout.agentPositions) - num_ghosts
+    # ground move-ghost actions consistent with the static facts: pacman may
+    # be at any location apart from the ghost, unless the facts fix it
+    pacman_locations = 1 if ghost_model == "directional" else len(positions) - 1
+    ground_actions = num_ghosts * num_pacman * pacman_locations * len(sources_to_targets)
+
+    if ghost_encoding == "slots":
+        compiled = render_slots(ghost_model, probability_distributions_by_id, sources_to_distribution_ids, slot_successors)
+        outcomes = sum(len(targets) for targets in slot_successors.values())
+        compiled["positions"] = positions
+        compiled["objects"] = OBJECTS + compiled["objects"]
+        compiled["initial_state"] = INITIAL_STATE + compiled["initial_state"]
+        compiled["ground_actions"] = ground_actions + num_ghosts * outcomes
+        compiled["max_arity"] = 6
+        return compiled
+
     for (probability_distribution_id, prob_dist) in probability_distributions_by_id.items():
         parameters = ["?a_loc - location", "?a_dir - direction"]
         parameter_names = ["?a_loc", "?a_dir"]
@@ -79,7 +183,12 @@ def generate(
             parameter_names += [f"?x{i}", f"?d{i}"]
             probabilistic_effects += [(f"{prob_dist[i-1]}", f"(and (at ?a ?x{i}) (looking ?a ?d{i}))")]
 
-        CONNECTED_GHOST_PREDICATES.append(f"(CONNECTED_GHOST_{probability_distribution_id} {' '.join(parameters)})")
+        predicate_parameters = parameters
+        if ghost_model == "directional":
+            predicate_parameters = ["?p_loc - location"] + parameters
+            parameter_names = ["?p_loc"] + parameter_names
+
+        CONNECTED_GHOST_PREDICATES.append(f"(CONNECTED_GHOST_{probability_distribution_id} {' '.join(predicate_parameters)})")
 
         MOVE_GHOST_ACTIONS.append(f"""
 (:action move-ghost-{probability_distribution_id}
@@ -100,12 +209,199 @@ def generate(
 )
 """)
 
-    for (pos_src, dir_src), target in sources_to_targets.items():
+    for (pacman_src, pos_src, dir_src), target in sources_to_targets.items():
         parameter_list = [f"{loc_name(pos_src)}", f"{dir_src}"]
+        if pacman_src is not None:
+            parameter_list.insert(0, loc_name(pacman_src))
         for (pos_target, dir_target) in target:
             parameter_list += [f"{loc_name(pos_target)}", f"{dir_target}"]
 
-        INITIAL_STATE.append(f"(CONNECTED_GHOST_{sources_to_distribution_ids[(pos_src, dir_src)]} {' '.join(parameter_list)})")
+        INITIAL_STATE.append(f"(CONNECTED_GHOST_{sources_to_distribution_ids[(pacman_src, pos_src, dir_src)]} {' '.join(parameter_list)})")
+
+    return {
+        "positions": positions,
+        "objects": OBJECTS,
+        "initial_state": INITIAL_STATE,
+        "ghost_state_predicates": ["(looking ?a - ghost ?d - direction)"],
+        "ghost_types": [],
+        "ghost_constants": [],
+        "predicates": CONNECTED_GHOST_PREDICATES,
+        "actions": MOVE_GHOST_ACTIONS,
+        "ground_actions": ground_actions,
+        "max_arity": 5 + 2 * max(map(len, probability_distributions), default=0),
+    }
+
+def render_slots(ghost_model, probability_distributions_by_id, sources_to_distribution_ids, slot_successors) -> dict:
+    """
+    Renders the ghost objects, facts, predicates and schemas of the "slots"
+    ghost encoding, given the successors of each (location, direction) pair.
+    """
+    CONNECTED_GHOST_PREDICATES = []
+    MOVE_GHOST_ACTIONS = []
+    INITIAL_STATE = []
+
+    slots = list(slot_successors)
+    slots += dict.fromkeys(target for targets in slot_successors.values() for target in targets
+                           if target not in slot_successors)
+    num_outcomes = max(map(len, probability_distributions_by_id.values()), default=0)
+
+    for (probability_distribution_id, prob_dist) in probability_distributions_by_id.items():
+        predicate_parameters = ["?s - slot"]
+        parameter_names = ["?s"]
+        if ghost_model == "directional":
+            predicate_parameters = ["?p_loc - location"] + predicate_parameters
+            parameter_names = ["?p_loc"] + parameter_names
+        probabilistic_effects = [(f"{prob}", f"(moving ?a outcome{i})") for i, prob in enumerate(prob_dist, start=1)]
+
+        CONNECTED_GHOST_PREDICATES.append(f"(GHOST_DIST_{probability_distribution_id} {' '.join(predicate_parameters)})")
+
+        MOVE_GHOST_ACTIONS.append(f"""
+(:action move-ghost-{probability_distribution_id}
+    :parameters (?a - ghost ?p - pacmanagent ?p_loc ?a_loc - location ?s - slot)
+    :precondition (and
+        (GHOST_DIST_{probability_distribution_id} {' '.join(parameter_names)})
+        (SLOT_LOCATION ?s ?a_loc)
+        (in-slot ?a ?s)
+        (at ?a ?a_loc)
+        (at ?p ?p_loc)
+        (not (= ?a_loc ?p_loc))
+        (turn ?a)
+    )
+    :effect (and
+        (not (turn ?a))
+{get_probabilistic_effect (probabilistic_effects, tab=8)}
+    )
+)
+""")
+
+    MOVE_GHOST_ACTIONS.append("""
+(:action apply-ghost-move
+    :parameters (?a - ghost ?o - outcome ?s ?t - slot ?x ?y - location)
+    :precondition (and
+        (moving ?a ?o)
+        (in-slot ?a ?s)
+        (SUCCESSOR ?s ?o ?t)
+        (SLOT_LOCATION ?s ?x)
+        (SLOT_LOCATION ?t ?y)
+    )
+    :effect (and
+        (not (moving ?a ?o)) (turn_check_kill ?a)
+        (not (in-slot ?a ?s)) (in-slot ?a ?t)
+        (not (at ?a ?x)) (at ?a ?y)
+    )
+)
+""")
+
+    INITIAL_STATE += [f"(SLOT_LOCATION {slot_name(*slot)} {loc_name(slot[0])})" for slot in slots]
+    for slot, targets in slot_successors.items():
+        INITIAL_STATE += [f"(SUCCESSOR {slot_name(*slot)} outcome{i} {slot_name(*target)})"
+                          for i, target in enumerate(targets, start=1)]
+    for (pacman_src, pos_src, dir_src), id in sources_to_distribution_ids.items():
+        parameter_list = [slot_name(pos_src, dir_src)]
+        if pacman_src is not None:
+            parameter_list.insert(0, loc_name(pacman_src))
+        INITIAL_STATE.append(f"(GHOST_DIST_{id} {' '.join(parameter_list)})")
+
+    return {
+        "objects": [" ".join(slot_name(*slot) for slot in slots) + " - slot"],
+        "initial_state": INITIAL_STATE,
+        "ghost_state_predicates": ["(in-slot ?a - ghost ?s - slot)",
+                                   "(moving ?a - ghost ?o - outcome)",
+                                   "(SLOT_LOCATION ?s - slot ?x - location)",
+                                   "(SUCCESSOR ?s - slot ?o - outcome ?t - slot)"],
+        "ghost_types": ["slot", "outcome"],
+        "ghost_constants": [" ".join(f"outcome{i}" for i in range(1, num_outcomes + 1)) + " - outcome"],
+        "predicates": CONNECTED_GHOST_PREDICATES,
+        "actions": MOVE_GHOST_ACTIONS,
+    }
+
+def ghost_symmetry(layout : Layout, ghost_encoding : str = "connected") -> dict:
+    """
+    Groups the ghosts that are interchangeable: all ghosts follow the same
+    model, so ghosts that can reach the same (location, direction) pairs
+    only differ by name. When it is Pacman's turn, permuting the ghost
+    arguments of the state predicates among the ghosts of a group yields an
+    equivalent state. Also counts the ghost configurations at Pacman's turn
+    with and without identifying these permutations.
+    """
+    groups = defaultdict(list)
+    group_starts = defaultdict(list)
+    for i, (is_pacman, position) in enumerate(layout.agentPositions):
+        if not is_pacman:
+            # ghosts only look in no direction on their own start position
+            states = reachable_ghost_states(layout, [position])
+            key = frozenset(state for state in states if state[1] != Directions.STOP)
+            groups[key].append(get_agent_name(i, is_pacman))
+            group_starts[key].append(position)
+
+    ordered, symmetric = 1, 1
+    for key, ghosts in groups.items():
+        states = len(reachable_ghost_states(layout, group_starts[key]))
+        ordered *= states ** len(ghosts)
+        symmetric *= math.comb(states + len(ghosts) - 1, len(ghosts))
+    return {
+        "groups": list(groups.values()),
+        "predicates": ["at", "in-slot"] if ghost_encoding == "slots" else ["at", "looking"],
+        "condition": f"(turn {get_agent_name(0, True)})",
+        "configurations": ordered,
+        "symmetric_configurations": symmetric,
+    }
+
+def load_compiled_layout(
+        layout : Layout,
+        ghost_model : str,
+        prob_attack : float,
+        prune_ghost_states : bool,
+        ghost_encoding : str,
+        cache_dir : str
+) -> dict:
+    """
+    Returns compile_layout(layout, ghost_model, prob_attack, prune_ghost_states,
+    ghost_encoding), from cache_dir if a previous run compiled the same layout
+    text with the same options.
+    """
+    key = json.dumps([CACHE_VERSION, layout.layoutText, ghost_model, str(prob_attack), prune_ghost_states, ghost_encoding])
+    path = os.path.join(cache_dir, hashlib.sha256(key.encode()).hexdigest() + ".json")
+    if os.path.exists(path):
+        with open(path) as f:
+            compiled = json.load(f)
+        compiled["positions"] = [tuple(position) for position in compiled["positions"]]
+        return compiled
+
+    compiled = compile_layout(layout, ghost_model, prob_attack, prune_ghost_states, ghost_encoding)
+    os.makedirs(cache_dir, exist_ok=True)
+    # write to a temporary file first, so that concurrent runs never read a
+    # partially written cache entry
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(compiled, f)
+    os.replace(tmp_path, path)
+    return compiled
+
+def generate(
+        layout : Layout,
+        sampled_food : int,
+        target_points : int,
+        ghost_model : str = "random",
+        prob_attack : float = 0.8,
+        cache_dir : str = None,
+        prune_ghost_states : bool = False,
+        ghost_encoding : str = "connected"
+) -> (str, str):
+
+    if cache_dir:
+        compiled = load_compiled_layout(layout, ghost_model, prob_attack, prune_ghost_states, ghost_encoding, cache_dir)
+    else:
+        compiled = compile_layout(layout, ghost_model, prob_attack, prune_ghost_states, ghost_encoding)
+    positions = compiled["positions"]
+    GHOST_STATE_PREDICATES = compiled["ghost_state_predicates"]
+    GHOST_TYPES = "".join(f" {type}" for type in compiled["ghost_types"])
+    GHOST_CONSTANTS = "".join(f"    (:constants {constants})\n" for constants in compiled["ghost_constants"])
+    CONNECTED_GHOST_PREDICATES = compiled["predicates"]
+    MOVE_GHOST_ACTIONS = compiled["actions"]
+    OBJECTS = list(compiled["objects"])
+    INITIAL_STATE = list(compiled["initial_state"])
+    GOAL = []
 
 
     food_positions = [position for position in positions if layout.isFood(position)]
@@ -130,13 +426,15 @@ def generate(
     INITIAL_STATE += [f"(= (killed-cost num{i}) {500 + 10*(target_points - i)})" for i in range(target_points)]
     previous_agent = None
     for i, (is_pacman, position) in enumerate(layout.agentPositions):
+        agent_name = get_agent_name(i, is_pacman)
         if is_pacman:
-            agent_name = f"pacman{i}" if i > 0 else "pacman"
             OBJECTS.append(f"{agent_name} - pacmanagent")
         else:
-            agent_name = f"ghost{i}"
             OBJECTS.append(f"{agent_name} - ghost")
-            INITIAL_STATE.append(f"(looking {agent_name} {Directions.STOP})")
+            if ghost_encoding == "slots":
+                INITIAL_STATE.append(f"(in-slot {agent_name} {slot_name(position, Directions.STOP)})")
+            else:
+                INITIAL_STATE.append(f"(looking {agent_name} {Directions.STOP})")
 
         INITIAL_STATE.append(f"(at {agent_name} {loc_name(position)})")
 
@@ -158,13 +456,13 @@ def generate(
 (define (domain pacman)
     (:requirements :strips :typing :negative-preconditions :action-costs :probabilistic-effects)
 
-    (:types location agent direction num - object
+    (:types location agent direction num{GHOST_TYPES} - object
             pacmanagent ghost - agent)
-            
+{GHOST_CONSTANTS}            
     (:predicates
         (has-point ?x - location)
         (at ?a - agent ?x - location)
-        (looking ?a - ghost ?d - direction)
+{backslash_join(GHOST_STATE_PREDICATES, tab=8)}
         (turn ?a - agent)
         (turn_check_kill ?a - ghost) 
         (eaten ?x - num)
@@ -268,6 +566,14 @@ def main():
     p.add_argument("--food", type=int, default=0, help="number of food. By default (0) all food in the layout. Otherwise, it is subsampled.")
     p.add_argument("--points", type=int, default=0, help="number of food to be collected. By default (0) all food. Otherwise, it should be lower than the total number of food.")
 
+    p.add_argument("--ghost", choices=["random", "directional"], default="random", help="ghost behaviour. Random ghosts choose uniformly among their legal moves, directional ghosts prefer moves towards pacman.")
+    p.add_argument("--prob-attack", type=float, default=0.8, help="probability with which directional ghosts move towards pacman")
+    p.add_argument("--prune-ghost-states", action="store_true", help="only generate CONNECTED_GHOST facts for (location, direction) pairs a ghost can reach, e.g., no ghost in a horizontal corridor looks north")
+    p.add_argument("--ghost-encoding", choices=GHOST_ENCODINGS, default="connected", help="encoding of the ghost moves. With slots, the move-ghost schemas have at most 6 parameters instead of up to 13, at the cost of an extra action per ghost move.")
+    p.add_argument("--symmetry", action="store_true", help="write the groups of interchangeable ghosts to symmetry.json")
+    p.add_argument("--stats", action="store_true", help="print the number of move-ghost schemas and of the static ghost facts of the ghost encoding, compare the ground ghost actions of both ghost encodings, and print the groups of interchangeable ghosts")
+    p.add_argument("--cache", type=str, default=None, help="directory in which the compiled layouts are cached, so that runs that only differ in --food, --points or --seed reuse them. By default, nothing is cached.")
+
     p.add_argument("--seed", type=int, help="RNG seed", default=1734)
     args = p.parse_args()
 
@@ -276,7 +582,23 @@ def main():
     with open(args.layout) as f:
         layout = Layout(f.read().splitlines())
 
-        domain, problem = generate(layout, args.food, args.points)
+        domain, problem = generate(layout, args.food, args.points, args.ghost, args.prob_attack, args.cache, args.prune_ghost_states, args.ghost_encoding)
+        if args.stats:
+            facts = [f"{problem.count('(' + prefix)} {prefix.rstrip('_')} facts"
+                     for prefix in GHOST_FACTS[args.ghost_encoding]]
+            print(f"{args.layout}: {domain.count('(:action move-ghost-')} move-ghost schemas, {', '.join(facts)}")
+            for ghost_encoding in GHOST_ENCODINGS:
+                compiled = compile_layout(layout, args.ghost, args.prob_attack, args.prune_ghost_states, ghost_encoding)
+                print(f"{args.layout}: {ghost_encoding} ghost encoding: {compiled['ground_actions']} ground ghost actions, "
+                      f"at most {compiled['max_arity']} parameters")
+        if args.stats or args.symmetry:
+            symmetry = ghost_symmetry(layout, args.ghost_encoding)
+        if args.stats:
+            print(f"{args.layout}: {len(symmetry['groups'])} ghost groups of sizes {[len(group) for group in symmetry['groups']]}, "
+                  f"{symmetry['configurations']} ghost configurations, {symmetry['symmetric_configurations']} up to symmetry")
+        if args.symmetry:
+            with open('symmetry.json', 'w') as f:
+                json.dump(symmetry, f, indent=4)
         with open('domain.pddl', 'w') as f:
             f.write(domain)
 
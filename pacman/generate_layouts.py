@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+
+import argparse
+import math
+import os
+import random
+from layout import Layout
+
+# size names used in the layout file names, by maximal number of reachable cells
+SIZES = [(40, "tiny"), (60, "small"), (100, "medium"), (1000, "large")]
+
+NEIGHBORS = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+
+
+def size_name(cells):
+    for max_cells, name in SIZES:
+        if cells <= max_cells:
+            return name
+    return "huge"
+
+
+def carve_maze(target_cells, loopiness):
+    """
+    Carves a maze with target_cells free cells into a grid of walls. A
+    spanning tree over the odd coordinates is grown at random from the
+    center, then walls between two free cells are removed to create loops.
+    The higher loopiness, the fewer tree nodes and the more loops. Without
+    loopiness, the cells missing from the tree are added as dead ends, so
+    the maze has no loops.
+
+    Returns the grid as a list of columns of booleans (True for free cells).
+    """
+    nodes = max(1, int((target_cells + 1) / (2 + loopiness)))
+    # leave some slack so that the tree does not fill the whole rectangle
+    columns = max(1, math.ceil(math.sqrt(2.6 * nodes)))
+    rows = max(1, math.ceil(1.3 * nodes / columns))
+    # the nodes and the walls between them must also leave room for the loops
+    while 3 * columns * rows - columns - rows < 1.3 * target_cells:
+        rows += 1
+    width, height = 2 * columns + 1, 2 * rows + 1
+    free = [[False] * height for _ in range(width)]
+
+    def carve(x, y):
+        # returns the number of newly freed cells
+        if free[x][y]:
+            return 0
+        free[x][y] = True
+        return 1
+
+    start = (2 * (columns // 2) + 1, 2 * (rows // 2) + 1)
+    count = carve(*start)
+    in_tree = {start}
+    frontier = [start]
+    loops = []
+
+    def grow(stub=False):
+        # extends the tree by one node adjacent to a random tree node, or
+        # only by the corridor cell towards it if stub is set
+        while frontier:
+            i = random.randrange(len(frontier))
+            x, y = frontier[i]
+            options = [(x + 2 * dx, y + 2 * dy, dx, dy) for dx, dy in NEIGHBORS
+                       if 0 < x + 2 * dx < width and 0 < y + 2 * dy < height
+                       and (x + 2 * dx, y + 2 * dy) not in in_tree]
+            if not options:
+                frontier[i] = frontier[-1]
+                frontier.pop()
+                continue
+            nx, ny, dx, dy = random.choice(options)
+            added = carve(x + dx, y + dy)
+            if stub and added:
+                return added
+            added += carve(nx, ny)
+            in_tree.add((nx, ny))
+            frontier.append((nx, ny))
+            for dx, dy in NEIGHBORS:
+                wx, wy = nx + dx, ny + dy
+                if (nx + 2 * dx, ny + 2 * dy) in in_tree and not free[wx][wy]:
+                    loops.append((wx, wy))
+            return added
+        return 0
+
+    while count + 2 <= target_cells and len(in_tree) < nodes:
+        added = grow()
+        if added == 0:
+            break
+        count += added
+    random.shuffle(loops)
+    while count < target_cells:
+        while loops and free[loops[-1][0]][loops[-1][1]]:
+            loops.pop()
+        if loops and loopiness > 0:
+            carve(*loops.pop())
+            count += 1
+        else:
+            added = grow(stub=target_cells - count == 1)
+            if added == 0:
+                break
+            count += added
+    return free
+
+
+def generate_layout(target_cells, ghosts, food_density, loopiness):
+    free = carve_maze(target_cells, loopiness)
+    width, height = len(free), len(free[0])
+    cells = [(x, y) for x in range(width) for y in range(height) if free[x][y]]
+    assert len(cells) > ghosts, "not enough cells for all agents"
+    agents = random.sample(cells, ghosts + 1)
+    chars = [['%' if not free[x][y] else ' ' for y in range(height)] for x in range(width)]
+    for x, y in cells:
+        if random.random() < food_density:
+            chars[x][y] = '.'
+    for i, (x, y) in enumerate(agents):
+        chars[x][y] = 'P' if i == 0 else 'G'
+    return [''.join(chars[x][y] for x in range(width)) for y in reversed(range(height))]
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("directory", type=str, help="directory to write the layouts to")
+    p.add_argument("cells", type=int, help="target number of reachable cells")
+    p.add_argument("--ghosts", type=int, default=1, help="number of ghosts")
+    p.add_argument("--food", type=float, default=0.5, help="probability that a cell contains food")
+    p.add_argument("--loopiness", type=float, default=0.3, help="number of loops relative to the number of maze nodes. 0 yields mazes without loops.")
+    p.add_argument("--count", type=int, default=1, help="number of layouts")
+    p.add_argument("--seed", type=int, help="RNG seed", default=1734)
+    args = p.parse_args()
+
+    assert args.cells > args.ghosts and args.loopiness >= 0
+    random.seed(args.seed)
+    os.makedirs(args.directory, exist_ok=True)
+    for i in range(args.count):
+        text = generate_layout(args.cells, args.ghosts, args.food, args.loopiness)
+        # the name follows the size-cells-ghosts scheme of the shipped layouts
+        cells = len(Layout(text).getReachablePositions())
+        name = f"{size_name(cells)}-{cells}-{args.ghosts}-{args.seed}-{i}.lay"
+        with open(os.path.join(args.directory, name), 'w') as f:
+            f.write('\n'.join(text) + '\n')
+
+
+if __name__ == "__main__":
+    main()
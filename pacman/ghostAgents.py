@@ -14,6 +14,7 @@
 
 from game import Actions
 from game import Directions
+from fractions import Fraction
 import functools
 
 
@@ -22,7 +23,7 @@ def getLegalActions(layout, ghostPosition, ghostDirection):
     Ghosts cannot stop, and cannot turn around unless they
     reach a dead end, but can turn 90 degrees at intersections.
     """
-    possibleActions = Actions.getPossibleActions(ghostPosition, layout.walls)
+    possibleActions = layout.getPossibleActions(ghostPosition)
     reverse = Actions.reverseDirection(ghostDirection)
     if Directions.STOP in possibleActions:
         possibleActions.remove(Directions.STOP)
@@ -138,14 +139,17 @@ class Counter(dict):
         """
         Edits the counter such that the total count of all
         keys sums to 1.  The ratio of counts for all keys
-        will remain the same. Note that normalizing an empty
-        Counter will result in an error.
+        will remain the same. Counts are replaced by exact
+        fractions formatted as "numerator/denominator", so
+        equal probabilities always yield equal strings. Note
+        that normalizing an empty Counter will result in an error.
         """
         total = self.totalCount()
         if total == 0:
             return
         for key in list(self.keys()):
-            self[key] = f"{int(self[key])}/{int(total)}"
+            value = Fraction(self[key]) / Fraction(total)
+            self[key] = f"{value.numerator}/{value.denominator}"
 
     def divideAll(self, divisor):
         """
@@ -295,8 +299,9 @@ class DirectionalGhost():
 
     def __init__(self, index, prob_attack=0.8, prob_scaredFlee=0.8):
         self.index = index
-        self.prob_attack = prob_attack
-        self.prob_scaredFlee = prob_scaredFlee
+        # exact probabilities, e.g., 4/5 instead of the float 0.8
+        self.prob_attack = Fraction(str(prob_attack))
+        self.prob_scaredFlee = Fraction(str(prob_scaredFlee))
 
     def getDistribution(self, layout, ghostPosition, ghostDirection, isScared, pacmanPosition):
         # Read variables from state
@@ -305,7 +310,7 @@ class DirectionalGhost():
 
         speed = 1
         if isScared:
-            speed = 0.5
+            speed = Fraction(1, 2)
 
         actionVectors = [Actions.directionToVector(
             a, speed) for a in legalActions]
@@ -13,7 +13,10 @@
 
 
 from game import Grid
+from game import gridFromString
+from game import Actions
 import os
+import re
 import random
 from functools import reduce
 
@@ -35,18 +38,19 @@ class Layout:
         self.numGhosts = 0
         self.processLayoutText(layoutText)
         self.layoutText = layoutText
-        self.totalFood = len(self.food.asList())
+        self.totalFood = self.food.count()
+        self.buildSuccessorTable()
 
     def getNumGhosts(self):
         return self.numGhosts
 
     def isWall(self, pos):
         x, col = pos
-        return self.walls[x][col]
+        return self.walls[x, col]
 
     def isFood(self, pos):
         x, col = pos
-        return self.food[x][col]
+        return self.food[x, col]
 
     def getRandomLegalPosition(self):
         x = random.choice(list(range(self.width)))
@@ -57,7 +61,53 @@ class Layout:
         return (x, y)
 
     def getLegalPositions(self):
-        return [ (x,y) for x in range(self.width) for y in range(self.height) if not self.isWall((x, y)) ]
+        return self.legalPositions[:]
+
+    def getReachablePositions(self):
+        """
+        Returns the legal positions reachable from the start position of any
+        agent, in the order of getLegalPositions().
+        """
+        reached = [False] * len(self.legalPositions)
+        queue = [self.positionIndex[pos] for _, pos in self.agentPositions]
+        for i in queue:
+            reached[i] = True
+        for i in queue:
+            for j in self.successorTable[i].values():
+                if not reached[j]:
+                    reached[j] = True
+                    queue.append(j)
+        return [pos for pos, r in zip(self.legalPositions, reached) if r]
+
+    def getPositionIndex(self, pos):
+        return self.positionIndex[pos]
+
+    def getSuccessors(self, pos):
+        """
+        Returns a dictionary mapping each action that does not run into a wall
+        from pos to the index of the resulting position, in the order of
+        Actions.getPossibleActions.
+        """
+        return self.successorTable[self.positionIndex[pos]]
+
+    def getPossibleActions(self, pos):
+        return list(self.successorTable[self.positionIndex[pos]])
+
+    def buildSuccessorTable(self):
+        """
+        Indexes all legal positions and precomputes their successors, so that
+        moves can be looked up instead of being checked against the walls.
+        """
+        self.legalPositions = self.walls.asList(False)
+        self.positionIndex = {pos: i for i, pos in enumerate(self.legalPositions)}
+        self.successorTable = []
+        for x, y in self.legalPositions:
+            successors = {}
+            for dir, (dx, dy) in Actions._directionsAsList:
+                successor = self.positionIndex.get((x + dx, y + dy))
+                if successor is not None:
+                    successors[dir] = successor
+            self.successorTable.append(successors)
 
     def getRandomCorner(self):
         poses = [(1, 1), (1, self.height - 2), (self.width - 2, 1),
@@ -87,19 +137,25 @@ class Layout:
          P - Pacman
         Other characters are ignored.
         """
-        maxY = self.height - 1
-        for y in range(self.height):
-            for x in range(self.width):
-                layoutChar = layoutText[maxY - y][x]
-                self.processLayoutChar(x, y, layoutChar)
+        # walls and food are read in bulk from the characters ordered by
+        # columns, all other characters are processed one by one
+        rows = [row[:self.width] for row in reversed(layoutText)]
+        cells = ''.join([''.join(column) for column in zip(*rows)])
+        if len(cells) != self.width * self.height:
+            raise IndexError('all layout rows must have the same length')
+        self.walls = gridFromString(self.width, self.height, cells, '%')
+        self.food = gridFromString(self.width, self.height, cells, '.')
+        for match in re.finditer('[^%. ]', cells):
+            x, y = divmod(match.start(), self.height)
+            self.processLayoutChar(x, y, match.group())
         self.agentPositions.sort()
         self.agentPositions = [(i == 0, pos) for i, pos in self.agentPositions]
 
     def processLayoutChar(self, x, y, layoutChar):
         if layoutChar == '%':
-            self.walls[x][y] = True
+            self.walls[x, y] = True
         elif layoutChar == '.':
-            self.food[x][y] = True
+            self.food[x, y] = True
         elif layoutChar == 'o':
             self.capsules.append((x, y))
         elif layoutChar == 'P':
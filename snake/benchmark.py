@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+
+import argparse
+import os
+import time
+
+from generate import RESPAWN_ENCODINGS, Board, generate_domain
+
+BOARDS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "boards")
+
+
+def _time(fn, repeat: int) -> tuple[float, str]:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def compare_respawn_encodings(board: Board, repeat: int) -> list[str]:
+    rows = []
+    for encoding in RESPAWN_ENCODINGS:
+        seconds, domain = _time(lambda: generate_domain(board, 10, encoding), repeat)
+        rows.append(
+            f"| {board.name} | {encoding} | {len(domain)} | {domain.count('(')} | {seconds * 1000:.2f} |"
+        )
+    return rows
+
+
+def count_ground_actions(
+    board: Board,
+    respawn_encoding: str,
+    prune_walls: bool,
+    points: int,
+    respawn_points: int,
+) -> int:
+    """Number of ground actions consistent with the static facts, where
+    nextSnake is restricted to adjacent cells as only moves can add it"""
+    wall = board._wall_mask()
+    locs = [i for i in range(len(wall)) if not prune_walls or not wall[i]]
+    out_degree = [
+        sum(1 for j in board._neighbors[i] if not prune_walls or not wall[j])
+        for i in locs
+    ]
+    adjacent = sum(out_degree)
+    count = (
+        respawn_points  # respawn
+        + adjacent  # unit-move
+        + adjacent * adjacent - sum(d * d for d in out_degree)  # move
+        + adjacent * points  # move-and-eat
+    )
+    if respawn_encoding == "linear":
+        count += adjacent + len(locs)  # respawn-cleanup, respawn-place
+    return count
+
+
+def compare_wall_pruning(board: Board, points: int, respawn_points: int) -> str:
+    counts = [
+        count_ground_actions(board, "linear", prune_walls, points, respawn_points)
+        for prune_walls in [False, True]
+    ]
+    return f"| {board.name} | {counts[0]} | {counts[1]} | {counts[1] / counts[0]:.2f} |"
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument(
+        "boards", nargs="*", help="Board files (default: all boards in boards/)"
+    )
+    p.add_argument("--repeat", type=int, default=5, help="Number of timing runs")
+    p.add_argument(
+        "--points", type=int, default=5, help="Number of points to collect"
+    )
+    p.add_argument(
+        "--respawn-points", type=int, default=1, help="Number of respawn points"
+    )
+    args = p.parse_args()
+
+    paths = args.boards or [
+        os.path.join(BOARDS, f) for f in sorted(os.listdir(BOARDS))
+    ]
+    boards = [Board(path) for path in paths]
+    print("| board | respawn encoding | domain bytes | expressions | time (ms) |")
+    print("|---|---|---|---|---|")
+    for board in boards:
+        for row in compare_respawn_encodings(board, args.repeat):
+            print(row)
+    print()
+    print("| board | ground actions | ground actions (--prune-walls) | ratio |")
+    print("|---|---|---|---|")
+    for board in boards:
+        print(compare_wall_pruning(board, args.points, args.respawn_points))
+
+
+if __name__ == "__main__":
+    main()
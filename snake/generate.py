@@ -6,6 +6,12 @@ import random
 import re
 from collections.abc import Iterable
 from fractions import Fraction
+from typing import Optional
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 DOMAIN = """
 (define (domain snake)
@@ -29,24 +35,9 @@ DOMAIN = """
         (collectedPoints ?n - num)
         (ADJACENT ?x ?y - loc) ;up down left right of a field
         (NEXT ?n0 ?n1 - num)
-        (RESPAWN-POINT ?x - loc)
-    )
-
-    (:action respawn
-        :parameters (?head)
-        :precondition (and
-            (headSnake ?head)
-            (RESPAWN-POINT ?head)
-        )
-        :effect (and 
-            (increase (total-cost) {exit_cost})
-            (not (headSnake ?head))
-            (not (blocked ?head))
-            (probabilistic
-{exit_effect}
-            )
-        )
+        (RESPAWN-POINT ?x - loc){respawn_predicates}
     )
+{respawn}
 
     (:action unit-move
     :parameters (?head ?newHead - loc)
@@ -119,6 +110,77 @@ DOMAIN = """
 """
 
 
+RESPAWN_QUADRATIC = """
+    (:action respawn
+        :parameters (?head)
+        :precondition (and
+            (headSnake ?head)
+            (RESPAWN-POINT ?head)
+        )
+        :effect (and 
+            (increase (total-cost) {exit_cost})
+            (not (headSnake ?head))
+            (not (blocked ?head))
+            (probabilistic
+{exit_effect}
+            )
+        )
+    )"""
+
+RESPAWN_LINEAR = """
+    (:action respawn
+        :parameters (?head)
+        :precondition (and
+            (headSnake ?head)
+            (RESPAWN-POINT ?head)
+        )
+        :effect (and
+            (increase (total-cost) {exit_cost})
+            (not (headSnake ?head))
+            (lastHead ?head)
+            (respawning)
+        )
+    )
+
+    (:action respawn-cleanup
+        :parameters (?tail ?newTail - loc)
+        :precondition (and
+            (respawning)
+            (tailSnake ?tail)
+            (nextSnake ?tail ?newTail)
+        )
+        :effect (and
+            (increase (total-cost) 0)
+            (not (blocked ?tail))
+            (not (tailSnake ?tail))
+            (not (nextSnake ?tail ?newTail))
+            (tailSnake ?newTail)
+        )
+    )
+
+    (:action respawn-place
+        :parameters (?head - loc)
+        :precondition (and
+            (respawning)
+            (lastHead ?head)
+            (tailSnake ?head)
+        )
+        :effect (and
+            (increase (total-cost) 0)
+            (not (respawning))
+            (not (lastHead ?head))
+            (not (tailSnake ?head))
+            (not (blocked ?head))
+            (probabilistic
+{exit_effect}
+            )
+        )
+    )"""
+
+RESPAWN_LINEAR_PREDICATES = """
+        (respawning) ;the snake is being removed from the board before respawning
+        (lastHead ?x - loc) ;the head of the snake being removed"""
+
 PROBLEM = """
 (define (problem snake-{name}-{seed})
 (:domain snake)
@@ -149,28 +211,45 @@ class Board:
     WALL = "*"
     CLEAR = "_"
     APPLE = "a"
-
-    def __init__(self, path: str, ignore_apples: bool = False):
+    NO_SPAWN = "e"
+
+    def __init__(
+        self,
+        path: str,
+        ignore_apples: bool = False,
+        use_numpy: bool = np is not None,
+        lines: Optional[list[str]] = None,
+    ):
+        """Reads the board from path, or from lines if given, in which case path
+        only determines the name of the board"""
         self.name: str = re.sub(r"[^\w]+", "-", os.path.basename(path).split(".")[0])
         self.board: list[list[str]] = []
-        with open(path, encoding="ascii") as f:
-            for line in f.readlines():
-                line = line.lower().strip()
-                if len(line) == 0:
-                    break
-                row = []
-                for c in line:
-                    if c == Board.WALL:
-                        row.append(Board.WALL)
-                    elif c == Board.APPLE and not ignore_apples:
-                        row.append(Board.APPLE)
-                    else:
-                        row.append(Board.CLEAR)
-                self.board.append(row)
+        if lines is None:
+            with open(path, encoding="ascii") as f:
+                lines = f.readlines()
+        for line in lines:
+            line = line.lower().strip()
+            if len(line) == 0:
+                break
+            row = []
+            for c in line:
+                if c == Board.WALL:
+                    row.append(Board.WALL)
+                elif c == Board.APPLE and not ignore_apples:
+                    row.append(Board.APPLE)
+                elif c == Board.NO_SPAWN:
+                    row.append(Board.NO_SPAWN)
+                else:
+                    row.append(Board.CLEAR)
+            self.board.append(row)
         assert len(self.board) > 0
         assert len(set((len(r) for r in self.board))) == 1
         self.dim0: int = len(self.board)
         self.dim1: int = len(self.board[0])
+        self.use_numpy: bool = use_numpy
+        # cells are indexed by x * dim1 + y, i.e., in the order of _dim()
+        self._names: list[str] = [f"grid-{x}-{y}" for x, y in self._dim()]
+        self._neighbors: list[list[int]] = self._compute_neighbors()
 
     def _join_effs(self, atoms: list[str]) -> str:
         return "\n            ".join(atoms)
@@ -184,9 +263,8 @@ class Board:
                 yield x, y
 
     def _i_non_walls(self) -> Iterable[tuple[int, int]]:
-        for x, y in self._dim():
-            if self.board[x][y] != Board.WALL:
-                yield x, y
+        for i in self._i_cells(False):
+            yield divmod(i, self.dim1)
 
     def _adj(self, x: int, y: int) -> Iterable[tuple[int, int]]:
         yield (self.dim0 + x - 1) % self.dim0, y
@@ -194,6 +272,46 @@ class Board:
         yield x, (self.dim1 + y - 1) % self.dim1
         yield x, (self.dim1 + y + 1) % self.dim1
 
+    def _compute_neighbors(self) -> list[list[int]]:
+        """Indices of the cells adjacent to each cell, in the order of _adj()"""
+        if self.use_numpy:
+            x, y = np.divmod(np.arange(self.dim0 * self.dim1), self.dim1)
+            return np.stack(
+                [
+                    (x - 1) % self.dim0 * self.dim1 + y,
+                    (x + 1) % self.dim0 * self.dim1 + y,
+                    x * self.dim1 + (y - 1) % self.dim1,
+                    x * self.dim1 + (y + 1) % self.dim1,
+                ],
+                axis=1,
+            ).tolist()
+        return [[a * self.dim1 + b for a, b in self._adj(x, y)] for x, y in self._dim()]
+
+    def _wall_mask(self) -> list[bool]:
+        if self.use_numpy:
+            return (np.array(self.board).reshape(-1) == Board.WALL).tolist()
+        return [c == Board.WALL for row in self.board for c in row]
+
+    def _i_cells(self, walls: bool) -> list[int]:
+        """Indices of all wall cells (walls=True) or of all other cells"""
+        if self.use_numpy:
+            mask = np.array(self.board).reshape(-1) == Board.WALL
+            return np.flatnonzero(mask == walls).tolist()
+        return [i for i, is_wall in enumerate(self._wall_mask()) if is_wall == walls]
+
+    def _i_spawn_cells(self) -> list[int]:
+        """Indices of the cells in which apples and the respawned snake may appear"""
+        if self.use_numpy:
+            cells = np.array(self.board).reshape(-1)
+            return np.flatnonzero(
+                (cells != Board.WALL) & (cells != Board.NO_SPAWN)
+            ).tolist()
+        return [
+            i
+            for i, c in enumerate(c for row in self.board for c in row)
+            if c != Board.WALL and c != Board.NO_SPAWN
+        ]
+
     def _get_not_blocked(self, ignore: list[tuple[int, int]] = []) -> str:
         return self._join_effs(
             [
@@ -223,46 +341,69 @@ class Board:
         )
 
     def get_exit_effect(self) -> str:
-        outcomes = []
-        non_walls = list(self._i_non_walls())
-        for x, y in non_walls:
-            outcomes.append(
+        names = self._names
+        wall = self._wall_mask()
+        non_walls = self._i_cells(False)
+        spawns = self._i_spawn_cells()
+        prob = str(Fraction(1, len(spawns)))
+        # every outcome resets all other cells and all snake links, so the
+        # shared parts are rendered only once
+        reset = [
+            f"(not (blocked {names[i]})) (not (tailSnake {names[i]}))"
+            for i in non_walls
+        ]
+        not_snake = " ".join(
+            [
+                f"(not (nextSnake {names[i]} {names[j]}))"
+                for i in non_walls
+                for j in self._neighbors[i]
+                if not wall[j]
+            ]
+        )
+        position = {i: k for k, i in enumerate(non_walls)}
+        return "\n".join(
+            [
                 16 * " "
-                + f"1/{len(non_walls)} (and"
-                + " (headSnake grid-{x}-{y})"
-                + " (tailSnake grid-{x}-{y})"
-                + " (blocked grid-{x}-{y})"
+                + f"{prob} (and"
+                + f" (headSnake {names[i]})"
+                + f" (tailSnake {names[i]})"
+                + f" (blocked {names[i]})"
                 + " ".join(
                     [
-                        " ".join(
-                            [
-                                f"(not (blocked grid-{a}-{b})) (not (tailSnake grid-{a}-{b}))"
-                                for a, b in non_walls
-                                if (a, b) != (x, y)
-                            ]
-                        ),
-                        " ".join(
-                            [
-                                f"(not (nextSnake grid-{xA}-{yA} grid-{xB}-{yB}))"
-                                for (xA, yA) in self._dim()
-                                for (xB, yB) in self._adj(xA, yA)
-                                if self.board[xA][yA] != Board.WALL
-                                and self.board[xB][yB] != Board.WALL
-                            ]
-                        ),
+                        " ".join(reset[: position[i]] + reset[position[i] + 1 :]),
+                        not_snake,
                     ]
                 )
                 + ")"
-            )
+                for i in spawns
+            ]
+        )
 
-        return "\n".join(outcomes)
+    def get_linear_exit_effect(self) -> str:
+        names = self._names
+        spawns = self._i_spawn_cells()
+        prob = str(Fraction(1, len(spawns)))
+        return "\n".join(
+            [
+                16 * " "
+                + f"{prob} (and"
+                + f" (headSnake {names[i]})"
+                + f" (tailSnake {names[i]})"
+                + f" (blocked {names[i]}))"
+                for i in spawns
+            ]
+        )
 
-    def get_adjacent(self) -> str:
+    def get_adjacent(self, prune_walls: bool = False) -> str:
+        names = self._names
+        wall = self._wall_mask() if prune_walls else [False] * len(names)
         return self._join_atoms(
             [
-                f"(ADJACENT grid-{x0}-{y0} grid-{x1}-{y1})"
-                for x0, y0 in self._dim()
-                for x1, y1 in self._adj(x0, y0)
+                f"(ADJACENT {names[i]} {names[j]})"
+                for i, neighbors in enumerate(self._neighbors)
+                if not wall[i]
+                for j in neighbors
+                if not wall[j]
             ]
         )
 
@@ -282,58 +423,169 @@ class Board:
     def get_next(self, n: int) -> str:
         return self._join_atoms([f"(NEXT n{i} n{i+1})" for i in range(n - 1)])
 
-    def get_locations(self) -> str:
-        return " ".join([f"grid-{x}-{y}" for x, y in self._dim()])
+    def get_locations(self, prune_walls: bool = False) -> str:
+        if prune_walls:
+            return " ".join([self._names[i] for i in self._i_cells(False)])
+        return " ".join(self._names)
 
     def get_spawns(self) -> str:
-        cells = list((x, y) for (x, y) in self._dim() if self.board[x][y] != Board.WALL)
-        prob = Fraction(1, len(cells))
-        return self._join_effs([f"{prob} (isPoint grid-{x}-{y})" for x, y in cells])
+        cells = self._i_spawn_cells()
+        prob = str(Fraction(1, len(cells)))
+        return self._join_effs([f"{prob} (isPoint {self._names[i]})" for i in cells])
 
-    def get_blocked(self) -> str:
+    def get_blocked(self, prune_walls: bool = False) -> str:
+        if prune_walls:
+            return ""
         return self._join_atoms(
-            [
-                f"(blocked grid-{x}-{y})"
-                for x, y in self._dim()
-                if self.board[x][y] == Board.WALL
-            ]
+            [f"(blocked {self._names[i]})" for i in self._i_cells(True)]
         )
 
     def get_apples(self, apples: list[tuple[int, int]]) -> str:
         return self._join_atoms([f"(isPoint grid-{x}-{y})" for (x, y) in apples])
 
+    def components(self) -> list[list[int]]:
+        """Connected components of the non-wall cells, largest first"""
+        wall = self._wall_mask()
+        component = [-1] * len(wall)
+        components = []
+        for start, is_wall in enumerate(wall):
+            if is_wall or component[start] >= 0:
+                continue
+            component[start] = len(components)
+            cells = [start]
+            for i in cells:
+                for j in self._neighbors[i]:
+                    if not wall[j] and component[j] < 0:
+                        component[j] = len(components)
+                        cells.append(j)
+            components.append(sorted(cells))
+        components.sort(key=len, reverse=True)
+        return components
+
+    def articulation_points(self) -> list[int]:
+        """Non-wall cells whose blocking disconnects their component"""
+        wall = self._wall_mask()
+        discovered = [-1] * len(wall)
+        low = [0] * len(wall)
+        points = set()
+        time = 0
+        for root, is_wall in enumerate(wall):
+            if is_wall or discovered[root] >= 0:
+                continue
+            discovered[root] = low[root] = time
+            time += 1
+            root_children = 0
+            stack = [(root, iter(self._neighbors[root]))]
+            while stack:
+                i, neighbors = stack[-1]
+                for j in neighbors:
+                    if wall[j]:
+                        continue
+                    if discovered[j] < 0:
+                        discovered[j] = low[j] = time
+                        time += 1
+                        stack.append((j, iter(self._neighbors[j])))
+                        break
+                    low[i] = min(low[i], discovered[j])
+                else:
+                    stack.pop()
+                    if not stack:
+                        continue
+                    parent = stack[-1][0]
+                    low[parent] = min(low[parent], low[i])
+                    if parent == root:
+                        root_children += 1
+                    elif low[i] >= discovered[parent]:
+                        points.add(parent)
+            if root_children > 1:
+                points.add(root)
+        return sorted(points)
+
+    def remove_unreachable(self) -> list[int]:
+        """Turns all cells outside of the largest component into walls"""
+        removed = [i for cells in self.components()[1:] for i in cells]
+        for i in removed:
+            x, y = divmod(i, self.dim1)
+            self.board[x][y] = Board.WALL
+        return removed
+
+    def get_connectivity_report(self) -> str:
+        components = self.components()
+        spawns = set(self._i_spawn_cells())
+        largest = set(components[0]) if len(components) > 0 else set()
+        points = self.articulation_points()
+        return "\n".join(
+            [
+                f"board {self.name}: {self.dim0}x{self.dim1}",
+                f"non-wall cells: {sum(len(cells) for cells in components)}",
+                f"components: {len(components)}"
+                + f" (sizes {' '.join(str(len(cells)) for cells in components)})",
+                f"spawn cells outside of the largest component: {len(spawns - largest)}",
+                f"articulation points: {len(points)}"
+                + "".join(f" {self._names[i]}" for i in points),
+            ]
+        )
+
+
+RESPAWN_ENCODINGS = ["quadratic", "linear"]
 
-def generate_domain(board: Board, exit_cost: int) -> str:
+
+def generate_domain(
+    board: Board,
+    exit_cost: int,
+    respawn_encoding: str = "quadratic",
+    prune_walls: bool = False,
+) -> str:
+    assert respawn_encoding in RESPAWN_ENCODINGS
+    if respawn_encoding == "linear":
+        # the snake is removed piece by piece at zero cost before a single
+        # placement outcome per cell, keeping the effect linear in board size
+        respawn = RESPAWN_LINEAR.format(
+            exit_effect=board.get_linear_exit_effect(), exit_cost=exit_cost
+        )
+        respawn_predicates = RESPAWN_LINEAR_PREDICATES
+    else:
+        respawn = RESPAWN_QUADRATIC.format(
+            exit_effect=board.get_exit_effect(), exit_cost=exit_cost
+        )
+        respawn_predicates = ""
     return DOMAIN.format(
-        locs=board.get_locations(),
-        exit_effect=board.get_exit_effect(),
+        locs=board.get_locations(prune_walls),
+        respawn=respawn,
+        respawn_predicates=respawn_predicates,
         spawns=board.get_spawns(),
-        exit_cost=exit_cost,
     )
 
 
 def generate_problem(
-    board: Board, seed: int, numPoints: int, respawn_points: int
+    board: Board,
+    seed: int,
+    numPoints: int,
+    respawn_points: int,
+    prune_walls: bool = False,
 ) -> str:
-    non_walls = list(board._i_non_walls())
+    # the snake starts and respawns in the largest component, which on
+    # connected boards are all non-wall cells
+    non_walls = [divmod(i, board.dim1) for i in board.components()[0]]
     assert len(non_walls) >= 1 + respawn_points
     random.shuffle(non_walls)
     x0, y0 = non_walls[0]
     respawn_points = non_walls[1 : 1 + respawn_points]
     apples = [(x, y) for x, y in board._dim() if board.board[x][y] == Board.APPLE]
     if len(apples) == 0:
-        i = random.randint(0, len(non_walls) - 1)
-        apples.append(non_walls[i])
+        spawns = [(x, y) for x, y in non_walls if board.board[x][y] != Board.NO_SPAWN]
+        i = random.randint(0, len(spawns) - 1)
+        apples.append(spawns[i])
     return PROBLEM.format(
         name=board.name,
         seed=seed,
         num=" ".join((f"n{i}" for i in range(numPoints + 1))),
         nexxt=board.get_next(numPoints + 1),
-        adjac=board.get_adjacent(),
+        adjac=board.get_adjacent(prune_walls),
         border=board._join_atoms(
             [f"(RESPAWN-POINT grid-{x}-{y})" for (x, y) in respawn_points]
         ),
-        blocked=board.get_blocked(),
+        blocked=board.get_blocked(prune_walls),
         apples=board.get_apples(apples),
         x0=x0,
         y0=y0,
@@ -378,6 +630,34 @@ def main():
         help="Number of respawn points on the map",
         default=1,
     )
+    p.add_argument(
+        "--respawn-encoding",
+        choices=RESPAWN_ENCODINGS,
+        help="Encoding of the respawn action; linear clears the snake in a cleanup"
+        " phase instead of resetting every cell in every outcome",
+        default="quadratic",
+    )
+    p.add_argument(
+        "--prune-walls",
+        action="store_true",
+        help="Do not declare wall cells as objects, so that no actions are"
+        " grounded over them",
+        default=False,
+    )
+    p.add_argument(
+        "--disconnected",
+        choices=["repair", "reject", "ignore"],
+        help="How to handle boards whose non-wall cells are not connected: turn"
+        " all cells outside of the largest component into walls, fail, or keep"
+        " the board as it is",
+        default="repair",
+    )
+    p.add_argument(
+        "--report",
+        action="store_true",
+        help="Print the connectivity analysis of the board",
+        default=False,
+    )
     p.add_argument("domain", help="Name of resulting domain file")
     p.add_argument("problem", help="Name of resulting problem file")
     p.add_argument("points", help="Number of points to collect", type=int)
@@ -387,12 +667,36 @@ def main():
     random.seed(args.seed)
 
     board = Board(args.map, args.ignore_apples)
+    if args.report:
+        print(board.get_connectivity_report())
+    if len(board.components()) > 1:
+        if args.disconnected == "reject":
+            raise SystemExit(f"Non-wall cells of board {board.name} are not connected")
+        if args.disconnected == "repair":
+            removed = board.remove_unreachable()
+            if args.report:
+                print(f"turned {len(removed)} unreachable cells into walls")
+    # the snake starts and the first apple appears in the largest component
+    components = board.components()
+    if not components or not set(board._i_spawn_cells()) & set(components[0]):
+        raise SystemExit(
+            f"Board {board.name} has no free cell in its largest component in"
+            " which apples and the respawned snake may appear"
+        )
     _distribute_apples(board, args.initial_apples)
 
     with open(args.domain, "w", encoding="ascii") as f:
-        f.write(generate_domain(board, args.respawn_cost))
+        f.write(
+            generate_domain(
+                board, args.respawn_cost, args.respawn_encoding, args.prune_walls
+            )
+        )
     with open(args.problem, "w", encoding="ascii") as f:
-        f.write(generate_problem(board, args.seed, args.points, args.respawn_points))
+        f.write(
+            generate_problem(
+                board, args.seed, args.points, args.respawn_points, args.prune_walls
+            )
+        )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+
+import argparse
+import os
+import random
+from collections import deque
+
+from generate import Board
+
+STYLES = ["cells", "bars", "blocks"]
+
+
+def _shape(style: str, max_length: int) -> list[tuple[int, int]]:
+    """Cell offsets of a random obstacle of the given style"""
+    if style == "cells":
+        return [(0, 0)]
+    if style == "bars":
+        length = random.randint(2, max(2, max_length))
+        if random.random() < 0.5:
+            return [(i, 0) for i in range(length)]
+        return [(0, i) for i in range(length)]
+    assert style == "blocks"
+    h, w = random.randint(1, 3), random.randint(2, 3)
+    return [(i, j) for i in range(h) for j in range(w)]
+
+
+def _place_obstacles(board: Board, num_walls: int, style: str):
+    max_length = min(board.dim0, board.dim1) // 3
+    placed = 0
+    while placed < num_walls:
+        x0, y0 = random.randint(0, board.dim0 - 1), random.randint(0, board.dim1 - 1)
+        for dx, dy in _shape(style, max_length):
+            x, y = (x0 + dx) % board.dim0, (y0 + dy) % board.dim1
+            if placed < num_walls and board.board[x][y] != Board.WALL:
+                board.board[x][y] = Board.WALL
+                placed += 1
+
+
+def _connect(board: Board):
+    """Removes walls until all non-wall cells are connected, carving the
+    cheapest path from a smaller component to the largest one each time"""
+    while True:
+        components = board.components()
+        if len(components) <= 1:
+            return
+        largest = set(components[0])
+        wall = board._wall_mask()
+        distance = {i: 0 for i in components[1]}
+        parent = {}
+        queue = deque(components[1])
+        while True:
+            i = queue.popleft()
+            if i in largest:
+                break
+            for j in board._neighbors[i]:
+                d = distance[i] + wall[j]
+                if d < distance.get(j, d + 1):
+                    distance[j] = d
+                    parent[j] = i
+                    if wall[j]:
+                        queue.append(j)
+                    else:
+                        queue.appendleft(j)
+        while i in parent:
+            x, y = divmod(i, board.dim1)
+            board.board[x][y] = Board.CLEAR
+            i = parent[i]
+
+
+def _place_no_spawn_regions(board: Board, regions: int, size: int):
+    for _ in range(regions):
+        x0, y0 = random.randint(0, board.dim0 - 1), random.randint(0, board.dim1 - 1)
+        for dx in range(size):
+            for dy in range(size):
+                x, y = (x0 + dx) % board.dim0, (y0 + dy) % board.dim1
+                if board.board[x][y] == Board.CLEAR:
+                    board.board[x][y] = Board.NO_SPAWN
+
+
+def generate_board(
+    name: str,
+    dim0: int,
+    dim1: int,
+    density: float,
+    style: str,
+    apples: int,
+    no_spawn_regions: int,
+    no_spawn_size: int,
+) -> Board:
+    assert dim0 > 0 and dim1 > 0
+    assert density >= 0.0 and density < 1.0
+    assert style in STYLES
+    board = Board(name, lines=[Board.CLEAR * dim1] * dim0)
+    _place_obstacles(board, int(density * dim0 * dim1), style)
+    _connect(board)
+    _place_no_spawn_regions(board, no_spawn_regions, no_spawn_size)
+    cells = [(x, y) for x, y in board._dim() if board.board[x][y] == Board.CLEAR]
+    assert len(cells) >= max(apples, 1), "no-spawn regions leave too few free cells"
+    for x, y in random.sample(cells, apples):
+        board.board[x][y] = Board.APPLE
+    return board
+
+
+def write_board(board: Board, path: str):
+    with open(path, "w", encoding="ascii") as f:
+        for row in board.board:
+            f.write("".join(row).upper() + "\n")
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("directory", help="Directory to write the boards to")
+    p.add_argument("rows", type=int, help="Number of rows")
+    p.add_argument("columns", type=int, help="Number of columns")
+    p.add_argument("--count", type=int, default=1, help="Number of boards")
+    p.add_argument(
+        "--density", type=float, default=0.1, help="Ratio of cells that are walls"
+    )
+    p.add_argument(
+        "--style",
+        choices=STYLES,
+        default="bars",
+        help="Shape of the obstacles: single cells, straight bars, or blocks",
+    )
+    p.add_argument(
+        "--apples", type=int, default=0, help="Number of apples placed initially"
+    )
+    p.add_argument(
+        "--no-spawn-regions",
+        type=int,
+        default=0,
+        help="Number of square regions in which nothing spawns",
+    )
+    p.add_argument(
+        "--no-spawn-size", type=int, default=2, help="Side length of no-spawn regions"
+    )
+    p.add_argument("--seed", type=int, default=1734, help="Seed")
+    args = p.parse_args()
+
+    random.seed(args.seed)
+    os.makedirs(args.directory, exist_ok=True)
+    for i in range(args.count):
+        name = f"{args.style}-{args.rows}x{args.columns}-{args.seed}-{i}"
+        board = generate_board(
+            name,
+            args.rows,
+            args.columns,
+            args.density,
+            args.style,
+            args.apples,
+            args.no_spawn_regions,
+            args.no_spawn_size,
+        )
+        write_board(board, os.path.join(args.directory, f"{name}.txt"))
+
+
+if __name__ == "__main__":
+    main()
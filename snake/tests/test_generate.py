@@ -0,0 +1,33 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+GENERATE = os.path.join(HERE, os.pardir, "generate.py")
+
+
+@pytest.mark.parametrize("disconnected", ["ignore", "repair"])
+def test_rejects_largest_component_without_spawn_cells(tmp_path, disconnected):
+    # the only free cells outside of the E region form a smaller component
+    result = subprocess.run(
+        [
+            sys.executable,
+            GENERATE,
+            "--map",
+            os.path.join(HERE, "boards", "no-spawn-component.txt"),
+            "--disconnected",
+            disconnected,
+            "--initial-apples",
+            "0",
+            str(tmp_path / "domain.pddl"),
+            str(tmp_path / "problem.pddl"),
+            "3",
+        ],
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 1
+    assert "has no free cell in its largest component" in result.stderr
+    assert "Traceback" not in result.stderr
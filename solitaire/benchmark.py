@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+
+import argparse
+import random
+import time
+
+from generate import ORDERINGS, deal, generate_domain, generate_problem
+
+# (cards, colors, stacks) of a standard deck with the stacks of Klondike
+BASE = (13, 4, 7)
+
+
+def _time(fn, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def time_deal(cards: int, colors: int, stacks: int, seed: int, repeat: int) -> str:
+    def run():
+        random.seed(seed)
+        return deal(cards, colors, stacks)
+
+    seconds, depg = _time(run, repeat)
+    dealt = sum(len(stack) for stack in depg.nodes_by_stack)
+    per_card = seconds / dealt * 1e6 if dealt else 0.0
+    return f"| {cards} | {colors} | {stacks} | {dealt} | {seconds * 1000:.2f} | {per_card:.1f} |"
+
+
+def count_ground_actions(cards: int, colors: int, stacks: int, ordering: str) -> int:
+    """Number of ground actions consistent with the static facts"""
+    card_objects = cards + 1 + stacks  # with DUMMY_CARD and STACK<i>
+    color_objects = colors + 1  # with DUMMY_COLOR
+    slots = card_objects * color_objects
+    next_pairs = cards  # NEXT facts, starting from DUMMY_CARD
+    count = (
+        next_pairs * color_objects  # stock-to-home
+        + next_pairs * color_objects * slots  # move-to-home
+        + 2 * slots  # re-draw-free, re-draw
+    )
+    if ordering == "is-less":
+        less_pairs = cards * (cards - 1) // 2
+        count += (
+            less_pairs * color_objects**2  # stock-to-card
+            + less_pairs * color_objects**2 * slots  # move-to-card
+        )
+    else:
+        count += (
+            next_pairs * color_objects  # probe-stock
+            + slots * slots  # stock-to-card
+            + next_pairs * color_objects * slots  # probe-card
+            + next_pairs  # raise-fits
+            + 2 * slots  # lock-card, abort-probe
+            + 2 * slots * slots  # take-card, move-to-card
+        )
+    return count
+
+
+def compare_orderings(cards: int, colors: int, stacks: int, seed: int) -> list[str]:
+    rows = []
+    for ordering in ORDERINGS:
+        domain = generate_domain(cards, colors, ordering)
+        problem = generate_problem(cards, colors, stacks, seed, ordering)
+        ground = count_ground_actions(cards, colors, stacks, ordering)
+        rows.append(
+            f"| {cards} | {colors} | {stacks} | {ordering} | {len(domain)} | {len(problem)} | {ground} |"
+        )
+    return rows
+
+
+def main():
+    p = argparse.ArgumentParser(
+        description="Times dealing as the cards, colors and stacks grow, one at a time starting from 13 cards, 4 colors and 7 stacks, then all together, and compares the sizes of the ordering encodings as they grow together"
+    )
+    p.add_argument(
+        "--scales",
+        type=int,
+        nargs="+",
+        default=[1, 2, 4, 8, 16],
+        help="Factors by which the cards, colors and stacks are multiplied",
+    )
+    p.add_argument("--repeat", type=int, default=3, help="Number of timing runs")
+    p.add_argument("--seed", help="RNG seed", type=int, default=1734)
+    args = p.parse_args()
+
+    print("| cards | colors | stacks | dealt cards | time (ms) | time per card (us) |")
+    print("|---|---|---|---|---|---|")
+    for dimension in range(len(BASE) + 1):
+        for scale in args.scales:
+            config = [
+                value * scale if dimension in (i, len(BASE)) else value
+                for i, value in enumerate(BASE)
+            ]
+            print(time_deal(*config, args.seed, args.repeat))
+    print()
+    print("| cards | colors | stacks | ordering | domain bytes | problem bytes | ground actions |")
+    print("|---|---|---|---|---|---|---|")
+    for scale in args.scales:
+        for row in compare_orderings(*(value * scale for value in BASE), args.seed):
+            print(row)
+
+
+if __name__ == "__main__":
+    main()
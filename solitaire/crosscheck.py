@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+
+import argparse
+import itertools
+import random
+import time
+from fractions import Fraction
+
+from generate import ORDERINGS, deal, deal_problem, generate_domain
+from solve import Solver
+
+# value of the states from which the goal is not reached, an upper bound on
+# the expected cost of all other states of small deals
+UNSOLVED = 1e6
+
+Atom = tuple[str, ...]
+# (probability, added atoms, deleted atoms) of an outcome of an action
+Outcome = tuple[float, frozenset, frozenset]
+
+
+def parse(text: str) -> list:
+    """Nested lists of the tokens of a PDDL file"""
+    tokens = text.lower().replace("(", " ( ").replace(")", " ) ").split()
+    stack: list[list] = [[]]
+    for token in tokens:
+        if token == "(":
+            stack.append([])
+        elif token == ")":
+            expr = stack.pop()
+            stack[-1].append(expr)
+        else:
+            stack[-1].append(token)
+    return stack[0][0]
+
+
+def _typed(items: list) -> list[tuple[str, str]]:
+    # (name, type) of a typed list such as ?a ?b - card ?c - color
+    result, names = [], []
+    i = 0
+    while i < len(items):
+        if items[i] == "-":
+            result.extend((name, items[i + 1]) for name in names)
+            names = []
+            i += 2
+        else:
+            names.append(items[i])
+            i += 1
+    return result
+
+
+def _literals(expr: list) -> list[tuple[bool, list]]:
+    # (positive, atom) of a conjunction of literals
+    if not expr:
+        return []
+    if expr[0] == "and":
+        return [lit for part in expr[1:] for lit in _literals(part)]
+    if expr[0] == "not":
+        return [(False, expr[1])]
+    return [(True, expr)]
+
+
+class Task:
+    """The ground actions and reachable states of a PDDL task of the subset
+    that generate.py writes"""
+
+    def __init__(self, domain: str, problem: str):
+        domain_expr, problem_expr = parse(domain), parse(problem)
+        sections = {part[0]: part for part in domain_expr[2:] + problem_expr[2:] if isinstance(part, list)}
+        objects: dict[str, list[str]] = {}
+        for name, type_ in _typed(sections[":constants"][1:]) + _typed(sections[":objects"][1:]):
+            objects.setdefault(type_, []).append(name)
+        self.init = frozenset(tuple(atom) for atom in sections[":init"][1:])
+        self.goal = [tuple(atom) for _, atom in _literals(sections[":goal"][1])]
+        actions = [part for part in domain_expr[2:] if part[0] == ":action"]
+        fluents = {
+            atom[0]
+            for action in actions
+            for _, atom in self._effect_literals(action[action.index(":effect") + 1])
+        }
+        # (name, arguments, precondition literals, (cost, outcomes))
+        self.actions: list[tuple[str, tuple, list, tuple[float, list[Outcome]]]] = []
+        for action in actions:
+            self.actions.extend(self._ground(action, objects, fluents))
+
+    def _effect_literals(self, expr: list) -> list[tuple[bool, list]]:
+        result = []
+        for part in expr[1:] if expr[0] == "and" else [expr]:
+            if part[0] == "probabilistic":
+                for i in range(1, len(part), 2):
+                    result.extend(_literals(part[i + 1]))
+            elif part[0] != "increase":
+                result.extend(_literals(part))
+        return result
+
+    def _ground(self, action: list, objects: dict[str, list[str]], fluents: set[str]):
+        name = action[1]
+        params = _typed(action[action.index(":parameters") + 1])
+        precondition = _literals(action[action.index(":precondition") + 1])
+        effect = action[action.index(":effect") + 1]
+        static = [(pos, atom) for pos, atom in precondition if atom[0] not in fluents]
+        dynamic = [(pos, atom) for pos, atom in precondition if atom[0] in fluents]
+        for values in itertools.product(*(objects[type_] for _, type_ in params)):
+            binding = dict(zip((p for p, _ in params), values))
+
+            def ground(atom: list) -> Atom:
+                return tuple(binding.get(term, term) for term in atom)
+
+            if all((ground(atom) in self.init) == pos for pos, atom in static):
+                pre = [(pos, ground(atom)) for pos, atom in dynamic]
+                yield name, values, pre, self._outcomes(effect, ground)
+
+    def _outcomes(self, effect: list, ground) -> tuple[float, list[Outcome]]:
+        cost = 0.0
+        add, delete = set(), set()
+        branches = [(1.0, frozenset(), frozenset())]
+        for part in effect[1:] if effect[0] == "and" else [effect]:
+            if part[0] == "increase":
+                cost += float(part[2])
+            elif part[0] == "probabilistic":
+                branches = []
+                for i in range(1, len(part), 2):
+                    p = float(Fraction(part[i]))
+                    lits = _literals(part[i + 1])
+                    branches.append((p, frozenset(ground(a) for pos, a in lits if pos), frozenset(ground(a) for pos, a in lits if not pos)))
+            else:
+                for pos, atom in _literals(part):
+                    (add if pos else delete).add(ground(atom))
+        return cost, [(p, frozenset(add) | a, frozenset(delete) | d) for p, a, d in branches]
+
+    def value(self) -> float:
+        """Optimal expected cost of the initial state, by value iteration over
+        all reachable states, or UNSOLVED"""
+        transitions: dict[frozenset, list[tuple[float, list[tuple[float, frozenset]]]]] = {}
+        todo = [self.init]
+        while todo:
+            state = todo.pop()
+            if state in transitions:
+                continue
+            transitions[state] = []
+            if all(atom in state for atom in self.goal):
+                continue
+            for _, _, pre, (cost, outcomes) in self.actions:
+                if all((atom in state) == pos for pos, atom in pre):
+                    successors = [(p, (state - d) | a) for p, a, d in outcomes]
+                    transitions[state].append((cost, successors))
+                    todo.extend(s for _, s in successors)
+        values = {state: 0.0 if not t else UNSOLVED for state, t in transitions.items()}
+        changed = True
+        while changed:
+            changed = False
+            for state, actions in transitions.items():
+                if actions:
+                    new = min(cost + sum(p * values[s] for p, s in succ) for cost, succ in actions)
+                    new = min(new, UNSOLVED)
+                    if new < values[state] - 1e-9:
+                        values[state] = new
+                        changed = True
+        return values[self.init]
+
+
+def main():
+    p = argparse.ArgumentParser(
+        description="Compares the optimal expected cost of solve.py with value"
+        " iteration over all reachable states of the PDDL task of each ordering"
+    )
+    p.add_argument("cards", help="Number of cards per color", type=int)
+    p.add_argument("colors", help="Number of colors (stacks to build)", type=int)
+    p.add_argument(
+        "stacks",
+        help="Number of auxiliary stacks used to temporarily store cards",
+        type=int,
+    )
+    p.add_argument("--seed", help="RNG seed", type=int, default=1734)
+    args = p.parse_args()
+    random.seed(args.seed)
+    stacks = deal(args.cards, args.colors, args.stacks).nodes_by_stack
+    start = time.perf_counter()
+    cost, _ = Solver(args.cards, args.colors).solve_deal(stacks)
+    print(f"solve.py: {cost:.6f} ({time.perf_counter() - start:.2f}s)")
+    for ordering in ORDERINGS:
+        start = time.perf_counter()
+        task = Task(
+            generate_domain(args.cards, args.colors, ordering),
+            deal_problem(args.cards, args.colors, stacks, str(args.seed), ordering),
+        )
+        value = task.value()
+        result = "unsolvable" if value >= UNSOLVED else f"{value:.6f}"
+        print(f"{ordering}: {result} ({time.perf_counter() - start:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
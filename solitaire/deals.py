@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+
+import argparse
+import os
+import random
+from collections.abc import Iterator
+
+from generate import ORDERINGS, DependencyGraph, deal, deal_problem, generate_domain
+
+Deal = tuple[tuple[tuple[int, int], ...], ...]
+
+
+def canonical_deal(stacks: list[list[tuple[int, int]]]) -> Deal:
+    """The stacks of (color, card) pairs of a deal with the colors numbered
+    in order of their first appearance, which is the same for all deals that
+    only differ by a permutation of the colors"""
+    labels: dict[int, int] = {}
+    return tuple(
+        tuple((labels.setdefault(color, len(labels)), card) for color, card in stack)
+        for stack in stacks
+    )
+
+
+def enumerate_deals(num_cards: int, num_colors: int, num_stacks: int) -> Iterator[Deal]:
+    """All deals that deal() can produce, up to permutations of the colors,
+    in their canonical form: a card of a color that does not appear yet gets
+    the lowest unused color. As in deal(), a card below the lowest dealt card
+    of its color is only dealt if enough such cards remain for the remaining
+    slots."""
+    depg = DependencyGraph(num_colors, num_stacks)
+    total = min(num_stacks * (num_stacks + 1) // 2, num_cards * num_colors)
+    slots = [stack for stack in range(num_stacks) for _ in range(stack + 1)][:total]
+
+    def extend(slot: int, used: int) -> Iterator[Deal]:
+        if slot == len(slots):
+            yield tuple(tuple(stack) for stack in depg.nodes_by_stack)
+            return
+        stack = slots[slot]
+        free = [cards[0] if cards else num_cards for cards in depg.cards_by_color]
+        slack = sum(free) - (len(slots) - slot)
+        for color in range(min(used + 1, num_colors)):
+            for card in range(max(0, free[color] - slack - 1), num_cards):
+                if (color, card) not in depg.positions and depg.push((color, card), stack):
+                    yield from extend(slot + 1, max(used, color + 1))
+                    depg.pop(stack)
+
+    yield from extend(0, 0)
+
+
+def main():
+    p = argparse.ArgumentParser(
+        description="Writes the problems of pairwise non-isomorphic deals, which"
+        " differ by more than a permutation of the colors, and a domain file"
+    )
+    p.add_argument("out_dir", help="Directory of the resulting files")
+    p.add_argument("cards", help="Number of cards per color", type=int)
+    p.add_argument("colors", help="Number of colors (stacks to build)", type=int)
+    p.add_argument(
+        "stacks",
+        help="Number of auxiliary stacks used to temporarily store cards",
+        type=int,
+    )
+    p.add_argument("--seed", help="First RNG seed", type=int, default=1734)
+    p.add_argument(
+        "--num-seeds",
+        help="Number of consecutive seeds, whose deals are deduplicated",
+        type=int,
+        default=100,
+    )
+    p.add_argument(
+        "--all",
+        action="store_true",
+        help="Enumerate all non-isomorphic deals instead of dealing with seeds",
+    )
+    p.add_argument(
+        "--ordering",
+        choices=list(ORDERINGS),
+        default="is-less",
+        help="Encoding of the cards a card can be put onto",
+    )
+    args = p.parse_args()
+    assert args.cards > 0 and args.colors > 0 and args.stacks >= 0
+    os.makedirs(args.out_dir, exist_ok=True)
+    with open(os.path.join(args.out_dir, "domain.pddl"), "w", encoding="ascii") as f:
+        f.write(generate_domain(args.cards, args.colors, args.ordering))
+
+    # (name, stacks) of the deals to write
+    deals: list[tuple[str, Deal]] = []
+    if args.all:
+        deals = [(f"deal{i}", stacks) for i, stacks in enumerate(enumerate_deals(args.cards, args.colors, args.stacks))]
+    else:
+        seen: set[Deal] = set()
+        for seed in range(args.seed, args.seed + args.num_seeds):
+            random.seed(seed)
+            stacks = deal(args.cards, args.colors, args.stacks).nodes_by_stack
+            key = canonical_deal(stacks)
+            if key not in seen:
+                seen.add(key)
+                # as generated by generate.py with this seed
+                deals.append((str(seed), tuple(tuple(stack) for stack in stacks)))
+    for name, stacks in deals:
+        path = os.path.join(args.out_dir, f"problem-{name}.pddl")
+        with open(path, "w", encoding="ascii") as f:
+            f.write(
+                deal_problem(
+                    args.cards,
+                    args.colors,
+                    [list(stack) for stack in stacks],
+                    name,
+                    args.ordering,
+                )
+            )
+    print(f"{len(deals)} deals")
+
+
+if __name__ == "__main__":
+    main()
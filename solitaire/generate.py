@@ -1,10 +1,10 @@
 #!/usr/bin/env python
 
 import argparse
+import bisect
 import random
 from fractions import Fraction
-
-MAX_RETRIES = 3
+from typing import Optional
 
 DOMAIN = """
 (define (domain lucky-solitaire)
@@ -16,51 +16,43 @@ DOMAIN = """
     (clear ?card - card ?color - color)
     (stock ?card - card ?color - color)
     (drawn ?card - card ?color - color)
-    (IS-LESS ?c0 ?c1 - card)
+{order_predicates}
     (NEXT ?c0 ?c1 - card)
 )
 (:constants
-    {0} - card
-    {1} - color
+    {cards} - card
+    {colors} - color
 )
 (:action stock-to-home
     :parameters (?card ?home-card - card ?color - color)
-    :precondition (and (stock ?card ?color) (not (drawn ?card ?color)) (home ?home-card ?color) (NEXT ?home-card ?card))
+    :precondition (and {idle}(stock ?card ?color) (not (drawn ?card ?color)) (home ?home-card ?color) (NEXT ?home-card ?card))
     :effect (and (drawn ?card ?color) (home ?card ?color) (not (home ?home-card ?color)) (increase (total-cost) 1))
 )
-(:action stock-to-card
-    :parameters (?card - card ?color - color ?card0 - card ?color0 - color)
-    :precondition (and (stock ?card ?color) (not (drawn ?card ?color)) (clear ?card0 ?color0) (IS-LESS ?card ?card0))
-    :effect (and (drawn ?card ?color) (not (clear ?card0 ?color0)) (on ?card ?color ?card0 ?color0) (clear ?card ?color) (increase (total-cost) 1))
-)
+{stock_to_card}
 (:action move-to-home
     :parameters (?card ?home-card - card ?color - color ?card0 - card ?color0 - color)
-    :precondition (and (on ?card ?color ?card0 ?color0) (clear ?card ?color) (home ?home-card ?color) (NEXT ?home-card ?card))
+    :precondition (and {idle}(on ?card ?color ?card0 ?color0) (clear ?card ?color) (home ?home-card ?color) (NEXT ?home-card ?card))
     :effect (and (home ?card ?color) (not (home ?home-card ?color)) (not (on ?card ?color ?card0 ?color0)) (clear ?card0 ?color0) (increase (total-cost) 1))
 )
-(:action move-to-card
-    :parameters (?card - card ?color - color ?card0 - card ?color0 - color ?card1 - card ?color1 - color)
-    :precondition (and (on ?card ?color ?card0 ?color0) (clear ?card1 ?color1) (IS-LESS ?card ?card1))
-    :effect (and (not (on ?card ?color ?card0 ?color0)) (on ?card ?color ?card1 ?color1) (clear ?card0 ?color0) (not (clear ?card1 ?color1)) (increase (total-cost) 1))
-)
+{move_to_card}
 (:action re-draw-free
     :parameters (?card - card ?color - color)
-    :precondition (and (drawn ?card ?color) (stock ?card ?color))
+    :precondition (and {idle}(drawn ?card ?color) (stock ?card ?color))
     :effect (and
         (not (stock ?card ?color))
         (probabilistic
-{2}
+{stock}
         )
         (increase (total-cost) 0)
     )
 )
 (:action re-draw
     :parameters (?card - card ?color - color)
-    :precondition (and (not (drawn ?card ?color)) (stock ?card ?color))
+    :precondition (and {idle}(not (drawn ?card ?color)) (stock ?card ?color))
     :effect (and
         (not (stock ?card ?color))
         (probabilistic
-{2}
+{stock}
         )
         (increase (total-cost) 10)
     )
@@ -68,8 +60,79 @@ DOMAIN = """
 )
 """
 
+# Encodings of the cards a card can be put onto, which have to be higher.
+# "is-less" lists an IS-LESS fact for each pair of cards in the problem,
+# quadratically many, and joins on them in stock-to-card and move-to-card.
+# "successor" only needs the NEXT facts: a card on the stock or a stack is
+# probed, and (fits ?card1) then moves up along NEXT, from the card above it
+# to a clear card, which is locked as the target. Only then is the card
+# moved, so a probe without a target is aborted once (fits ?card1) reaches
+# the highest card, which leaves the state as before the probe. The other
+# actions require that no card is probed or moved, so cards are never held
+# back as an additional buffer.
+ORDERINGS: dict[str, dict[str, str]] = {
+    "is-less": {
+        "order_predicates": "    (IS-LESS ?c0 ?c1 - card)",
+        "idle": "",
+        "stock_to_card": """(:action stock-to-card
+    :parameters (?card - card ?color - color ?card0 - card ?color0 - color)
+    :precondition (and (stock ?card ?color) (not (drawn ?card ?color)) (clear ?card0 ?color0) (IS-LESS ?card ?card0))
+    :effect (and (drawn ?card ?color) (not (clear ?card0 ?color0)) (on ?card ?color ?card0 ?color0) (clear ?card ?color) (increase (total-cost) 1))
+)""",
+        "move_to_card": """(:action move-to-card
+    :parameters (?card - card ?color - color ?card0 - card ?color0 - color ?card1 - card ?color1 - color)
+    :precondition (and (on ?card ?color ?card0 ?color0) (clear ?card1 ?color1) (IS-LESS ?card ?card1))
+    :effect (and (not (on ?card ?color ?card0 ?color0)) (on ?card ?color ?card1 ?color1) (clear ?card0 ?color0) (not (clear ?card1 ?color1)) (increase (total-cost) 1))
+)""",
+    },
+    "successor": {
+        "order_predicates": "    (idle)\n    (probing ?card - card ?color - color)\n    (fits ?card - card)\n    (aimed)\n    (locked ?card - card ?color - color)\n    (holding ?card - card ?color - color)",
+        "idle": "(idle) ",
+        "stock_to_card": """(:action probe-stock
+    :parameters (?card ?next - card ?color - color)
+    :precondition (and (idle) (stock ?card ?color) (not (drawn ?card ?color)) (NEXT ?card ?next))
+    :effect (and (not (idle)) (probing ?card ?color) (fits ?next) (increase (total-cost) 0))
+)
+(:action stock-to-card
+    :parameters (?card - card ?color - color ?card0 - card ?color0 - color)
+    :precondition (and (probing ?card ?color) (stock ?card ?color) (not (drawn ?card ?color)) (locked ?card0 ?color0))
+    :effect (and (idle) (not (probing ?card ?color)) (not (aimed)) (not (locked ?card0 ?color0)) (drawn ?card ?color) (not (clear ?card0 ?color0)) (on ?card ?color ?card0 ?color0) (clear ?card ?color) (increase (total-cost) 1))
+)""",
+        "move_to_card": """(:action probe-card
+    :parameters (?card ?next - card ?color - color ?card0 - card ?color0 - color)
+    :precondition (and (idle) (on ?card ?color ?card0 ?color0) (NEXT ?card ?next))
+    :effect (and (not (idle)) (probing ?card ?color) (fits ?next) (increase (total-cost) 0))
+)
+(:action raise-fits
+    :parameters (?card ?next - card)
+    :precondition (and (fits ?card) (NEXT ?card ?next))
+    :effect (and (not (fits ?card)) (fits ?next) (increase (total-cost) 0))
+)
+(:action lock-card
+    :parameters (?card - card ?color - color)
+    :precondition (and (fits ?card) (clear ?card ?color))
+    :effect (and (not (fits ?card)) (aimed) (locked ?card ?color) (increase (total-cost) 0))
+)
+(:action abort-probe
+    :parameters (?card - card ?color - color)
+    :precondition (and (probing ?card ?color) (fits {top}))
+    :effect (and (idle) (not (probing ?card ?color)) (not (fits {top})) (increase (total-cost) 0))
+)
+(:action take-card
+    :parameters (?card - card ?color - color ?card0 - card ?color0 - color)
+    :precondition (and (probing ?card ?color) (aimed) (on ?card ?color ?card0 ?color0))
+    :effect (and (not (probing ?card ?color)) (holding ?card ?color) (not (on ?card ?color ?card0 ?color0)) (clear ?card0 ?color0) (increase (total-cost) 0))
+)
+(:action move-to-card
+    :parameters (?card - card ?color - color ?card1 - card ?color1 - color)
+    :precondition (and (holding ?card ?color) (locked ?card1 ?color1))
+    :effect (and (idle) (not (holding ?card ?color)) (not (aimed)) (not (locked ?card1 ?color1)) (on ?card ?color ?card1 ?color1) (not (clear ?card1 ?color1)) (increase (total-cost) 1))
+)""",
+    },
+}
+
 PROBLEM = """
-(define (problem lucky-solitaire-{num_cards}-{num_colors}-{num_stacks}-{seed})
+(define (problem lucky-solitaire-{num_cards}-{num_colors}-{num_stacks}-{name})
 (:domain lucky-solitaire)
 (:objects
     DUMMY_COLOR - color
@@ -87,51 +150,100 @@ PROBLEM = """
 
 
 class DependencyGraph:
+    """
+    Cards dealt onto the stacks, with an edge from each card to the cards that
+    can only go home after it: the card below it on its stack and the next
+    higher card of its color. A deal is solvable without moving cards between
+    stacks iff the graph is acyclic, so push rejects cards that close a cycle.
+
+    A new card closes a cycle iff the next lower card of its color can only go
+    home after the card it covers. The cards reachable from the top card of
+    each stack are therefore cached. Pushing onto a stack extends its cache by
+    the cards reachable from the new card that were not reached before, and
+    only drops the caches that reached the next lower card of its color, so
+    filling one stack after another costs about one search per stack.
+    """
+
     def __init__(self, num_colors: int, num_stacks: int):
-        self.nodes_by_color: list[list[tuple[int, int, int]]] = [
-            [] for _ in range(num_colors)
-        ]
         self.nodes_by_stack: list[list[tuple[int, int]]] = [
             [] for _ in range(num_stacks)
         ]
+        # sorted cards on the stacks, by color
+        self.cards_by_color: list[list[int]] = [[] for _ in range(num_colors)]
+        # stack and index in the stack of each node
+        self.positions: dict[tuple[int, int], tuple[int, int]] = {}
+        # nodes reachable from the top node of each stack, if known
+        self._reached: list[Optional[set[tuple[int, int]]]] = [
+            set() for _ in range(num_stacks)
+        ]
+
+    def _color_neighbor(
+        self, node: tuple[int, int], offset: int
+    ) -> Optional[tuple[int, int]]:
+        # the next higher (offset 1) or lower (offset -1) dealt card of the color
+        cards = self.cards_by_color[node[0]]
+        i = bisect.bisect_left(cards, node[1])
+        if offset > 0 and i < len(cards) and cards[i] == node[1]:
+            i += 1
+        elif offset < 0:
+            i -= 1
+        return (node[0], cards[i]) if 0 <= i < len(cards) else None
+
+    def _extend(self, reached: set[tuple[int, int]], node: Optional[tuple[int, int]]):
+        # adds the nodes reachable from node to reached, which must already
+        # contain all nodes reachable from the nodes it contains
+        todo = [node] if node is not None and node not in reached else []
+        reached.update(todo)
+        while todo:
+            stack, i = self.positions[todo.pop()]
+            successors = [self._color_neighbor(self.nodes_by_stack[stack][i], 1)]
+            if i > 0:
+                successors.append(self.nodes_by_stack[stack][i - 1])
+            for successor in successors:
+                if successor is not None and successor not in reached:
+                    reached.add(successor)
+                    todo.append(successor)
+
+    def reached(self, stack: int) -> set[tuple[int, int]]:
+        """The cards that can only go home after the top card of the stack,
+        including it"""
+        reached = self._reached[stack]
+        if reached is None:
+            reached = set()
+            nodes = self.nodes_by_stack[stack]
+            self._extend(reached, nodes[-1] if nodes else None)
+            self._reached[stack] = reached
+        return reached
 
     def push(self, node: tuple[int, int], stack: int) -> bool:
         assert stack < len(self.nodes_by_stack)
-        self.nodes_by_color[node[0]].append(
-            (node[1], stack, len(self.nodes_by_stack[stack]))
-        )
-        self.nodes_by_stack[stack].append(node)
-
-        closed = set()
-        stack_trace = set()
-
-        def dfs(stack_: int, idx_: int):
-            assert stack_ not in stack_trace
-            stack_trace.add(stack_)
-            color, card = self.nodes_by_stack[stack_][idx_]
-            for pred, stack2, idx2 in self.nodes_by_color[color]:
-                if pred < card:
-                    if (stack2, idx2) in closed:
-                        continue
-                    if stack2 in stack_trace:
-                        return False
-                    if not dfs(stack2, idx2):
-                        return False
-            stack_trace.remove(stack_)
-            closed.add((stack_, idx_))
-            return True
-
-        for i in reversed(range(len(self.nodes_by_stack[stack]) - 1)):
-            if not dfs(stack, i):
-                self.nodes_by_color[node[0]].pop(-1)
-                self.nodes_by_stack[stack].pop(-1)
-                return False
+        lower = self._color_neighbor(node, -1)
+        reached = self.reached(stack)
+        if lower is not None and lower in reached:
+            return False
 
+        bisect.insort(self.cards_by_color[node[0]], node[1])
+        self.positions[node] = (stack, len(self.nodes_by_stack[stack]))
+        self.nodes_by_stack[stack].append(node)
+        # the node reaches the nodes below it, which reached already contains
+        self._extend(reached, node)
+        for i, other in enumerate(self._reached):
+            if i != stack and other is not None and lower in other:
+                self._reached[i] = None
         return True
 
+    def pop(self, stack: int) -> tuple[int, int]:
+        """Removes the top card of the stack, which may change which cards
+        the other cards reach, so all caches are dropped"""
+        node = self.nodes_by_stack[stack].pop()
+        self.cards_by_color[node[0]].remove(node[1])
+        del self.positions[node]
+        self._reached = [None] * len(self._reached)
+        return node
+
 
-def generate_domain(num_cards: int, num_colors: int) -> str:
-    assert num_cards > 0 and num_colors > 0
+def generate_domain(num_cards: int, num_colors: int, ordering: str = "is-less") -> str:
+    assert num_cards > 0 and num_colors > 0 and ordering in ORDERINGS
     cards = [f"card{i}" for i in range(num_cards)]
     colors = [f"color{i}" for i in range(num_colors)]
     prob = Fraction(1, num_cards * num_colors)
@@ -140,7 +252,77 @@ def generate_domain(num_cards: int, num_colors: int) -> str:
         for i in range(num_cards)
         for j in range(num_colors)
     ]
-    return DOMAIN.format(" ".join(cards), " ".join(colors), "\n".join(stock))
+    return DOMAIN.format(
+        cards=" ".join(cards),
+        colors=" ".join(colors),
+        stock="\n".join(stock),
+        **{
+            key: text.replace("{top}", f"card{num_cards - 1}")
+            for key, text in ORDERINGS[ordering].items()
+        },
+    )
+
+
+def _gap(cards: list[int], card: int, num_cards: int) -> int:
+    # number of cards of a color between a dealt card and the next dealt one
+    i = bisect.bisect_right(cards, card)
+    return (cards[i] if i < len(cards) else num_cards) - card - 1
+
+
+def deal(num_cards: int, num_colors: int, num_stacks: int) -> DependencyGraph:
+    """
+    Deals i + 1 cards onto the i-th stack, as long as cards remain. Cards
+    below the lowest dealt card of their color can go onto any card, so the
+    remaining slots can always be filled with them, highest first, while there
+    are at least as many of them as slots. Each card is therefore drawn
+    uniformly from the cards that keep the deal solvable and keep enough such
+    cards, and the stacks are full whenever there are enough cards.
+    """
+    depg = DependencyGraph(num_colors, num_stacks)
+    colors = depg.cards_by_color
+    remaining = min(num_stacks * (num_stacks + 1) // 2, num_cards * num_colors)
+    for stack in range(num_stacks):
+        # number of cards of each color above a dealt card that the top card
+        # does not reach, which the stack is still empty for
+        above = [num_cards - cards[0] - len(cards) if cards else 0 for cards in colors]
+        seen: set[tuple[int, int]] = set()
+        for _ in range(min(stack + 1, remaining)):
+            reached = depg.reached(stack)
+            free = [cards[0] if cards else num_cards for cards in colors]
+            slack = sum(free) - remaining
+            lowest = [max(0, f - slack - 1) for f in free]
+            i = random.randrange(sum(free) - sum(lowest) + sum(above))
+            for color in range(num_colors):
+                if i < free[color] - lowest[color] + above[color]:
+                    break
+                i -= free[color] - lowest[color] + above[color]
+            cards = colors[color]
+            if i < free[color] - lowest[color]:
+                card = lowest[color] + i
+            else:
+                i -= free[color] - lowest[color]
+                for lower in cards:
+                    if (color, lower) not in reached:
+                        gap = _gap(cards, lower, num_cards)
+                        if i < gap:
+                            card = lower + 1 + i
+                            break
+                        i -= gap
+
+            # the gap the card splits shrinks, and the card opens a new one
+            j = bisect.bisect_left(cards, card)
+            if j > 0:
+                above[color] -= _gap(cards, cards[j - 1], num_cards)
+            pushed = depg.push((color, card), stack)
+            assert pushed
+            if j > 0:
+                above[color] += _gap(cards, cards[j - 1], num_cards)
+            above[color] += _gap(cards, card, num_cards)
+            for node in reached - seen:
+                above[node[0]] -= _gap(colors[node[0]], node[1], num_cards)
+                seen.add(node)
+            remaining -= 1
+    return depg
 
 
 def generate_problem(
@@ -148,23 +330,26 @@ def generate_problem(
     num_colors: int,
     num_stacks: int,
     seed: int,
+    ordering: str = "is-less",
 ) -> str:
     assert num_cards > 0 and num_colors > 0 and num_stacks >= 0
+    assert ordering in ORDERINGS
     random.seed(seed)
+    depg = deal(num_cards, num_colors, num_stacks)
+    return deal_problem(num_cards, num_colors, depg.nodes_by_stack, str(seed), ordering)
+
+
+def deal_problem(
+    num_cards: int,
+    num_colors: int,
+    stacks: list[list[tuple[int, int]]],
+    name: str,
+    ordering: str = "is-less",
+) -> str:
+    """The problem for the stacks of (color, card) pairs of a deal, named
+    lucky-solitaire-<cards>-<colors>-<stacks>-<name>"""
+    num_stacks = len(stacks)
     cards = ["DUMMY_CARD"] + [f"STACK{i}" for i in range(num_stacks)]
-    depg = DependencyGraph(num_colors, num_stacks)
-    available_cards = [
-        (color, card) for color in range(num_colors) for card in range(num_cards)
-    ]
-    for stack in range(num_stacks):
-        for _ in range(stack + 1):
-            if len(available_cards) == 0:
-                break
-            for _ in range(MAX_RETRIES):
-                i = random.randint(0, len(available_cards) - 1)
-                if depg.push(available_cards[i], stack):
-                    del available_cards[i]
-                    break
     init = (
         [f"(home DUMMY_CARD color{i})" for i in range(num_colors)]
         + [
@@ -173,30 +358,34 @@ def generate_problem(
             "(NEXT DUMMY_CARD card0)",
         ]
         + [f"(NEXT card{i} card{i+1})" for i in range(num_cards - 1)]
-        + [
-            f"(IS-LESS card{i} card{j})"
-            for i in range(num_cards - 1)
-            for j in range(i + 1, num_cards)
-        ]
+        + (
+            [
+                f"(IS-LESS card{i} card{j})"
+                for i in range(num_cards - 1)
+                for j in range(i + 1, num_cards)
+            ]
+            if ordering == "is-less"
+            else ["(idle)"]
+        )
         + [
             f"(on card{card} color{color} STACK{i} DUMMY_COLOR)"
             for i in range(num_stacks)
-            for (color, card) in depg.nodes_by_stack[i][:1]
+            for (color, card) in stacks[i][:1]
         ]
         + [
-            f"(on card{depg.nodes_by_stack[i][j][1]} color{depg.nodes_by_stack[i][j][0]} card{depg.nodes_by_stack[i][j-1][1]} color{depg.nodes_by_stack[i][j-1][0]})"
+            f"(on card{stacks[i][j][1]} color{stacks[i][j][0]} card{stacks[i][j-1][1]} color{stacks[i][j-1][0]})"
             for i in range(num_stacks)
-            for j in range(1, len(depg.nodes_by_stack[i]))
+            for j in range(1, len(stacks[i]))
         ]
         + [
             f"(clear card{card} color{color})"
             for i in range(num_stacks)
-            for (color, card) in depg.nodes_by_stack[i][-1:]
+            for (color, card) in stacks[i][-1:]
         ]
         + [
             f"(drawn card{card} color{color})"
             for i in range(num_stacks)
-            for (color, card) in depg.nodes_by_stack[i]
+            for (color, card) in stacks[i]
         ]
     )
     goal = [f"(home card{num_cards - 1} color{i})" for i in range(num_colors)]
@@ -204,7 +393,7 @@ def generate_problem(
         num_cards=num_cards,
         num_colors=num_colors,
         num_stacks=num_stacks,
-        seed=seed,
+        name=name,
         cards=" ".join(cards),
         init="\n    ".join(init),
         goal="\n    ".join(goal),
@@ -223,9 +412,15 @@ def main():
         type=int,
     )
     p.add_argument("--seed", help="RNG seed", type=int, default=1734)
+    p.add_argument(
+        "--ordering",
+        choices=list(ORDERINGS),
+        default="is-less",
+        help="Encoding of the cards a card can be put onto",
+    )
     args = p.parse_args()
     with open(args.domain_file, "w", encoding="ascii") as f:
-        f.write(generate_domain(args.cards, args.colors))
+        f.write(generate_domain(args.cards, args.colors, args.ordering))
     with open(args.problem_file, "w", encoding="ascii") as f:
         f.write(
             generate_problem(
@@ -233,6 +428,7 @@ def main():
                 args.colors,
                 args.stacks,
                 args.seed,
+                args.ordering,
             )
         )
 
@@ -0,0 +1,305 @@
+#!/usr/bin/env python
+
+import argparse
+import math
+import random
+import time
+
+from generate import deal
+
+# stock slot of states in which the stock card has been drawn
+DRAWN = -1
+
+# A pile of cards, bottom first, on a STACK<i> (base -1) or on a card that
+# went home from a pile and stays clear there (base is that card). Cards are
+# numbered color * num_cards + card.
+Pile = tuple[int, tuple[int, ...]]
+Arrangement = tuple[Pile, ...]
+# drawn cards, cards at home, cards at home that are clear bases, piles
+Level = tuple[int, int, int, Arrangement]
+
+
+class Solver:
+    """
+    Optimal expected cost of the lucky-solitaire domain of generate.py
+    (--ordering is-less) for a deal, by value iteration over states made of
+    bitmasks of the drawn cards, the cards at home and the clear cards at
+    home, and the piles of cards on the stacks and on clear cards at home.
+
+    Three properties of the domain keep the states few:
+    - a drawn stock card is redrawn for free (re-draw-free), until a card comes
+      up that was not drawn before, so each undrawn card comes up with the
+      same probability;
+    - moving a card home is never worse than keeping it on its pile, since it
+      stays clear and accepts the same cards at home, so cards go home as soon
+      as they can, except for the stock card;
+    - piles on different stacks are interchangeable, as no card can be put
+      onto an empty stack.
+
+    States are grouped by their drawn cards, cards at home and clear cards at
+    home, which only grow, so the values of later groups are memoized and
+    value iteration only runs over the arrangements of the piles within a
+    group. The fixed point of the value of redrawing is computed exactly.
+
+    A run gives up when the expected cost of continuing exceeds give_up_cost,
+    which counts as a dead end; without it, runs only end in dead ends from
+    states in which the goal cannot be reached.
+    """
+
+    def __init__(
+        self,
+        num_cards: int,
+        num_colors: int,
+        redraw_cost: float = 10,
+        give_up_cost: float = math.inf,
+    ):
+        self.num_cards = num_cards
+        self.full = (1 << (num_cards * num_colors)) - 1
+        self.redraw_cost = redraw_cost
+        self.give_up_cost = give_up_cost
+        # (expected cost, dead-end probability) by level and stock slot
+        self.values: dict[Level, dict[int, tuple[float, float]]] = {}
+
+    def rank(self, card: int) -> int:
+        return card % self.num_cards
+
+    def _fits_home(self, card: int, home: int) -> bool:
+        return self.rank(card) == 0 or bool(home >> (card - 1) & 1)
+
+    def _settle(
+        self, piles: list[Pile], home: int, bases: int
+    ) -> tuple[int, Arrangement, int, int]:
+        # moves the top cards of the piles home while they fit, and returns
+        # the number of moved cards and the resulting state
+        cost = 0
+        piles = [(base, list(cards)) for base, cards in piles]
+        progress = True
+        while progress:
+            progress = False
+            for _, cards in piles:
+                while cards and self._fits_home(cards[-1], home):
+                    card = cards.pop()
+                    home |= 1 << card
+                    bases |= 1 << card
+                    cost += 1
+                    progress = True
+        arrangement = tuple(sorted((base, tuple(cards)) for base, cards in piles if cards))
+        return cost, arrangement, home, bases
+
+    def _targets(self, arrangement: Arrangement, bases: int) -> list[tuple[int, int]]:
+        # (card, index of its pile or -1) of the clear cards that accept cards
+        occupied = 0
+        targets = []
+        for i, (base, cards) in enumerate(arrangement):
+            targets.append((cards[-1], i))
+            if base >= 0:
+                occupied |= 1 << base
+        free = bases & ~occupied
+        while free:
+            card = (free & -free).bit_length() - 1
+            targets.append((card, -1))
+            free &= free - 1
+        return targets
+
+    def _put(
+        self, arrangement: Arrangement, target: tuple[int, int], cards: tuple[int, ...]
+    ) -> list[Pile]:
+        card, i = target
+        piles = list(arrangement)
+        if i < 0:
+            piles.append((card, cards))
+        else:
+            piles[i] = (piles[i][0], piles[i][1] + cards)
+        return piles
+
+    def _moves(
+        self, arrangement: Arrangement, home: int, bases: int
+    ) -> list[tuple[int, Arrangement, int, int]]:
+        # (cost, arrangement, home, bases) after each move-to-card
+        targets = self._targets(arrangement, bases)
+        result = []
+        for i, (base, cards) in enumerate(arrangement):
+            for j, card in enumerate(cards):
+                rest = arrangement[:i] + ((base, cards[:j]),) + arrangement[i + 1 :]
+                for target in targets:
+                    # the segment cannot go onto its own top card
+                    if target[1] != i and self.rank(card) < self.rank(target[0]):
+                        piles = self._put(rest, target, cards[j:])
+                        cost, moved, home2, bases2 = self._settle(piles, home, bases)
+                        result.append((1 + cost, moved, home2, bases2))
+        return result
+
+    def _stock_moves(
+        self, arrangement: Arrangement, home: int, bases: int, card: int
+    ) -> list[tuple[int, Arrangement, int, int]]:
+        # (cost, arrangement, home, bases) after stock-to-home and stock-to-card
+        result = []
+        if self._fits_home(card, home):
+            cost, settled, home2, bases2 = self._settle(list(arrangement), home | 1 << card, bases)
+            result.append((1 + cost, settled, home2, bases2))
+        for target in self._targets(arrangement, bases):
+            if self.rank(card) < self.rank(target[0]):
+                piles = self._put(arrangement, target, (card,))
+                cost, settled, home2, bases2 = self._settle(piles, home, bases)
+                result.append((1 + cost, settled, home2, bases2))
+        return result
+
+    def _redraw(self, costs: list[float]) -> float:
+        # r = redraw_cost + mean(min(cost, r)) over the undrawn cards, which
+        # is the least (n * redraw_cost + sum of the k least costs) / k
+        n = len(costs)
+        best = math.inf
+        total = n * self.redraw_cost
+        for k, cost in enumerate(sorted(costs), 1):
+            if cost == math.inf:
+                break
+            total += cost
+            best = min(best, total / k)
+        return best
+
+    def solve(self, level: Level):
+        """Memoizes the values of the states of level and of all states that
+        can be reached from them"""
+        if level in self.values:
+            return
+        drawn, home, bases, _ = level
+        if home == self.full:
+            self.values[level] = {DRAWN: (0.0, 0.0)}
+            return
+        undrawn = [card for card in range(self.full.bit_length()) if not drawn >> card & 1]
+        slots = undrawn or [DRAWN]
+
+        # arrangements reachable by moves that send no card home, with their
+        # successors within the level and the best (cost, successor) leaving
+        # the level by slot
+        moves: dict[Arrangement, list[Arrangement]] = {}
+        exits: dict[Arrangement, dict[int, tuple[float, float]]] = {}
+        todo = [level[3]]
+        while todo:
+            arrangement = todo.pop()
+            if arrangement in moves or (drawn, home, bases, arrangement) in self.values:
+                continue
+            moves[arrangement] = []
+            best = {slot: (math.inf, 1.0) for slot in slots}
+            for cost, moved, home2, bases2 in self._moves(arrangement, home, bases):
+                if home2 == home:
+                    moves[arrangement].append(moved)
+                    todo.append(moved)
+                    continue
+                successor = (drawn, home2, bases2, moved)
+                self.solve(successor)
+                for slot in slots:
+                    value, dead = self.values[successor][slot]
+                    best[slot] = min(best[slot], (cost + value, dead))
+            for card in undrawn:
+                for cost, settled, home2, bases2 in self._stock_moves(arrangement, home, bases, card):
+                    successor = (drawn | 1 << card, home2, bases2, settled)
+                    self.solve(successor)
+                    value, dead = self.values[successor][DRAWN]
+                    best[card] = min(best[card], (cost + value, dead))
+            exits[arrangement] = best
+
+        def lookup(arrangement: Arrangement) -> dict[int, tuple[float, float]]:
+            return values[arrangement] if arrangement in values else self.values[(drawn, home, bases, arrangement)]
+
+        def update(arrangement: Arrangement) -> dict[int, tuple[float, float]]:
+            # Bellman update of all slots of an arrangement under the current
+            # values, with the dead-end probability of the chosen actions
+            options = {slot: exits[arrangement][slot] for slot in slots}
+            for moved in moves[arrangement]:
+                successor = lookup(moved)
+                for slot in slots:
+                    value, dead = successor[slot]
+                    options[slot] = min(options[slot], (1 + value, dead))
+            result = dict(options)
+            if undrawn:
+                redraw = self._redraw([options[card][0] for card in undrawn])
+                kept = [options[card][1] for card in undrawn if options[card][0] < redraw]
+                dead = sum(kept) / len(kept) if kept else 1.0
+                for card in undrawn:
+                    result[card] = min(result[card], (redraw, dead))
+            for slot in slots:
+                if result[slot][0] >= self.give_up_cost:
+                    result[slot] = (self.give_up_cost, 1.0)
+            if undrawn:
+                result[DRAWN] = (
+                    sum(result[card][0] for card in undrawn) / len(undrawn),
+                    sum(result[card][1] for card in undrawn) / len(undrawn),
+                )
+            return result
+
+        values = {
+            arrangement: {slot: (math.inf, 1.0) for slot in slots + [DRAWN]}
+            for arrangement in moves
+        }
+        changed = True
+        while changed:
+            changed = False
+            for arrangement in moves:
+                new = update(arrangement)
+                if new != values[arrangement]:
+                    old = values[arrangement]
+                    changed |= any(
+                        not math.isclose(new[slot][0], old[slot][0], rel_tol=1e-12)
+                        or not math.isclose(new[slot][1], old[slot][1], rel_tol=1e-12, abs_tol=1e-12)
+                        for slot in new
+                    )
+                    values[arrangement] = new
+        for arrangement, value in values.items():
+            self.values[(drawn, home, bases, arrangement)] = value
+
+    def solve_deal(self, stacks: list[list[tuple[int, int]]]) -> tuple[float, float]:
+        """(expected cost, dead-end probability) of an optimal policy for the
+        stacks of (color, card) pairs dealt by generate.deal"""
+        piles = [
+            (-1, tuple(color * self.num_cards + card for color, card in stack))
+            for stack in stacks
+            if stack
+        ]
+        drawn = 0
+        for _, cards in piles:
+            for card in cards:
+                drawn |= 1 << card
+        cost, arrangement, home, bases = self._settle(piles, 0, 0)
+        level = (drawn, home, bases, arrangement)
+        self.solve(level)
+        value, dead = self.values[level][DRAWN]
+        return cost + value, dead
+
+
+def main():
+    p = argparse.ArgumentParser(
+        description="Computes the optimal expected cost of a deal of generate.py"
+    )
+    p.add_argument("cards", help="Number of cards per color", type=int)
+    p.add_argument("colors", help="Number of colors (stacks to build)", type=int)
+    p.add_argument(
+        "stacks",
+        help="Number of auxiliary stacks used to temporarily store cards",
+        type=int,
+    )
+    p.add_argument("--seed", help="RNG seed", type=int, default=1734)
+    p.add_argument(
+        "--redraw-cost", help="Cost of re-draw", type=float, default=10
+    )
+    p.add_argument(
+        "--give-up-cost",
+        help="Expected cost beyond which a run gives up, as a dead end",
+        type=float,
+        default=math.inf,
+    )
+    args = p.parse_args()
+    random.seed(args.seed)
+    depg = deal(args.cards, args.colors, args.stacks)
+    solver = Solver(args.cards, args.colors, args.redraw_cost, args.give_up_cost)
+    start = time.perf_counter()
+    cost, dead = solver.solve_deal(depg.nodes_by_stack)
+    seconds = time.perf_counter() - start
+    print(f"expected cost: {cost:.4f}")
+    print(f"dead-end probability: {dead:.4f}")
+    print(f"states: {sum(len(slots) for slots in solver.values.values())}")
+    print(f"time: {seconds:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+#!/usr/bin/env python
+
+import argparse
+
+# Tile sets for the domain and the engine. Each tile is drawn with
+# probability proportional to its weight and has a table of the cells covered
+# by each of its placement actions. A cell (i, j) stands for (?x<i>, ?y<j>) of
+# the action, where ?x<i+1> is right of ?x<i> and ?y<j+1> is below ?y<j>.
+TileSet = dict[str, dict]
+
+# the tiles of domain.pddl, whose T tile has no placement actions and always
+# has to be redrawn
+DEFAULT_TILES: TileSet = {
+    "I": {
+        "weight": 1,
+        "orientations": {
+            "I_Vertical": [(0, 0), (0, 1), (0, 2), (0, 3)],
+            "I_Horizontal": [(0, 0), (1, 0), (2, 0), (3, 0)],
+        },
+    },
+    "L": {
+        "weight": 1,
+        "orientations": {
+            "L_0": [(0, 0), (0, 1), (0, 2), (1, 2)],
+            "L_90": [(2, 0), (0, 1), (1, 1), (2, 1)],
+            "L_180": [(0, 0), (1, 0), (1, 1), (1, 2)],
+            "L_270": [(0, 0), (0, 1), (1, 0), (2, 0)],
+        },
+    },
+    "MirroredL": {
+        "weight": 1,
+        "orientations": {
+            "MirroredL_0": [(0, 2), (1, 0), (1, 1), (1, 2)],
+            "MirroredL_90": [(0, 0), (0, 1), (1, 1), (2, 1)],
+            "MirroredL_180": [(0, 0), (1, 0), (0, 1), (0, 2)],
+            "MirroredL_270": [(0, 0), (1, 0), (2, 0), (2, 1)],
+        },
+    },
+    "Square": {
+        "weight": 1,
+        "orientations": {
+            "Square": [(0, 0), (0, 1), (1, 0), (1, 1)],
+        },
+    },
+    "S": {
+        "weight": 1,
+        "orientations": {
+            "S": [(0, 1), (1, 1), (1, 0), (2, 0)],
+            "S_Flipped": [(0, 0), (0, 1), (1, 1), (1, 2)],
+        },
+    },
+    "MirroredS": {
+        "weight": 1,
+        "orientations": {
+            "MirroredS": [(0, 0), (1, 0), (1, 1), (2, 1)],
+            "MirroredS_Flipped": [(1, 0), (0, 1), (0, 2), (1, 1)],
+        },
+    },
+    "T": {
+        "weight": 1,
+        "orientations": {},
+    },
+}
+
+
+def rotations(name: str, cells: list[tuple[int, int]]) -> dict[str, list[tuple[int, int]]]:
+    """The distinct clockwise rotations of a shape, named <name>_<degrees>"""
+    result: dict[str, list[tuple[int, int]]] = {}
+    seen = set()
+    for degrees in (0, 90, 180, 270):
+        key = frozenset(cells)
+        if key not in seen:
+            seen.add(key)
+            result[f"{name}_{degrees}"] = cells
+        rows = max(j for _, j in cells)
+        cells = sorted((rows - j, i) for i, j in cells)
+    return result
+
+
+def shape_size(cells: list[tuple[int, int]]) -> tuple[int, int]:
+    """(columns, rows) spanned by the cells of an orientation"""
+    return max(i for i, _ in cells) + 1, max(j for _, j in cells) + 1
+
+
+def anchors(width: int, height: int, cells: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    """(x0, y0) of each placement of an orientation inside the grid, where
+    x0 is its leftmost column and y0 its top row"""
+    columns, rows = shape_size(cells)
+    return [(x0, y0) for y0 in range(rows - 1, height) for x0 in range(width - columns + 1)]
+
+
+TILE_SETS: dict[str, TileSet] = {
+    "default": DEFAULT_TILES,
+    # without the T tile, so that every drawn tile may fit
+    "reduced": {tile: t for tile, t in DEFAULT_TILES.items() if tile != "T"},
+    # with placement actions for the T tile
+    "full": {
+        **DEFAULT_TILES,
+        "T": {"weight": 1, "orientations": rotations("T", [(0, 0), (1, 0), (2, 0), (1, 1)])},
+    },
+}
+
+
+class Engine:
+    """Tetris on a width x height grid without gravity, as in domain.pddl.
+
+    Boards are bitboards: bit y * width + x is set iff hpos<x>, vpos<y> is
+    blocked, where vpos0 is the bottom row.
+    """
+
+    def __init__(self, width: int, height: int, tiles: TileSet = DEFAULT_TILES):
+        self.width = width
+        self.height = height
+        self.tiles = tiles
+        self.full = (1 << (width * height)) - 1
+        # fewest cells covered by a tile that can be drawn
+        self.min_cells = min(
+            (len(cells) for t in tiles.values() if t["weight"] > 0 for cells in t["orientations"].values()),
+            default=width * height + 1,
+        )
+        # (action, x0, top row y0, mask) of every placement inside the grid
+        self.placements: dict[str, list[tuple[str, int, int, int]]] = {}
+        # masks of all placements by their lowest set bit
+        self.placements_by_cell: list[list[int]] = [[] for _ in range(width * height)]
+        for tile, t in tiles.items():
+            self.placements[tile] = []
+            for orientation, cells in t["orientations"].items():
+                for x0, y0 in anchors(width, height, cells):
+                    mask = 0
+                    for i, j in cells:
+                        mask |= self.bit(x0 + i, y0 - j)
+                    self.placements[tile].append((f"place_{orientation}", x0, y0, mask))
+                    lowest = (mask & -mask).bit_length() - 1
+                    if t["weight"] > 0 and mask not in self.placements_by_cell[lowest]:
+                        self.placements_by_cell[lowest].append(mask)
+
+    def bit(self, x: int, y: int) -> int:
+        return 1 << (y * self.width + x)
+
+    def board(self, blocked: list[tuple[int, int]]) -> int:
+        board = 0
+        for x, y in blocked:
+            board |= self.bit(x, y)
+        return board
+
+    def legal_placements(self, board: int, tile: str) -> list[tuple[str, int, int, int]]:
+        """(action, x0, y0, mask) of the placements of tile that fit on board"""
+        return [p for p in self.placements[tile] if not p[3] & board]
+
+    def _capacity(self, board: int) -> int:
+        """Upper bound on the number of tiles that still fit on board: the
+        sum over the connected regions of free cells of their size divided
+        by the size of the smallest tile"""
+        capacity = 0
+        free = ~board & self.full
+        left_column = sum(self.bit(0, y) for y in range(self.height))
+        right_column = left_column << (self.width - 1)
+        while free:
+            region = free & -free
+            while True:
+                grown = region
+                grown |= (region << 1) & ~left_column
+                grown |= (region >> 1) & ~right_column
+                grown |= region << self.width
+                grown |= region >> self.width
+                grown &= free
+                if grown == region:
+                    break
+                region = grown
+            capacity += region.bit_count() // self.min_cells
+            free &= ~region
+        return capacity
+
+    def can_place(self, board: int, tiles: int, redraws: bool = True) -> bool:
+        """Whether a policy can place the given number of tiles on board, no
+        matter which tiles are drawn.
+
+        With redraws, a tile that does not fit can be redrawn until one that
+        fits comes up, so it suffices that some sequence of tiles fits. The
+        search then only branches on the lowest free cell: either a tile
+        covers it, or it stays free for good. Without redraws, every tile
+        that can be drawn must fit in a way that keeps the rest placeable.
+        """
+        memo: dict[tuple[int, int], bool] = {}
+
+        def search(board: int, tiles: int) -> bool:
+            if tiles == 0:
+                return True
+            key = (board, tiles)
+            if key in memo:
+                return memo[key]
+            if self._capacity(board) < tiles:
+                result = False
+            elif redraws:
+                free = ~board & self.full
+                cell = (free & -free).bit_length() - 1
+                result = any(
+                    search(board | mask, tiles - 1)
+                    for mask in self.placements_by_cell[cell]
+                    if not mask & board
+                ) or search(board | (1 << cell), tiles)
+            else:
+                result = all(
+                    any(search(board | mask, tiles - 1) for _, _, _, mask in self.legal_placements(board, tile))
+                    for tile, t in self.tiles.items()
+                    if t["weight"] > 0
+                )
+            memo[key] = result
+            return result
+
+        return search(board, tiles)
+
+    def render(self, board: int) -> str:
+        return "\n".join(
+            "".join("#" if board & self.bit(x, y) else "." for x in range(self.width))
+            for y in reversed(range(self.height))
+        )
+
+
+def main():
+    p = argparse.ArgumentParser(
+        description="Decides whether rounds tiles can be placed on a grid"
+    )
+    p.add_argument("width", type=int, help="Width of the Tetris grid")
+    p.add_argument("height", type=int, help="Height of the Tetris grid")
+    p.add_argument("rounds", type=int, help="Number of rounds")
+    p.add_argument(
+        "--no-redraws",
+        action="store_true",
+        help="Require that every drawn tile fits, without redrawing",
+    )
+    p.add_argument(
+        "--tiles", choices=list(TILE_SETS), default="default", help="Tile set"
+    )
+    args = p.parse_args()
+    engine = Engine(args.width, args.height, TILE_SETS[args.tiles])
+    print(engine.can_place(0, args.rounds, not args.no_redraws))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,22 @@
 
 import argparse
 import random
+import sys
+import time
 from collections.abc import Iterable
+from fractions import Fraction
+from itertools import product
+from engine import Engine, TILE_SETS, DEFAULT_TILES, TileSet, anchors, shape_size
+
+# ways to populate the grid initially
+FILLS = ["columns", "play"]
+
+# probability that simulated play drops a tile at random instead of greedily
+EXPLORATION = 0.1
+
+# "connected" place actions chain their positions through ABOVE and LEFT,
+# "anchors" ones require a static ANCHOR_<orientation> fact listing them
+ENCODINGS = ["connected", "anchors"]
 
 
 def get_adjacent(x: int, y: int, width: int, height: int) -> Iterable[tuple[int, int]]:
@@ -31,6 +46,160 @@ def fill_board(width: int, height: int, num_blocked: int) -> list[tuple[int, int
     return blocked
 
 
+DOMAIN = """(define (domain tetris)
+    (:requirements :typing :equality :negative-preconditions :action-costs :probabilistic-effects)
+
+    (:types Hposition Vposition round tile)
+
+    (:constants
+        {tiles} - tile
+    )
+
+    (:predicates
+        {static_predicates}
+        (NEXT ?i ?j - round)
+        (blocked ?x - Hposition ?y - Vposition)
+        (nextTile ?t - tile)
+        (currentRound ?r - round)
+        (playerMoved)
+    )
+
+    (:functions (total-cost) - number)
+
+    (:action startNextRound
+        :parameters (?r0 ?r1 - round)
+        :precondition (and
+            (playerMoved)
+            (currentRound ?r0)
+            (NEXT ?r0 ?r1)
+        )
+        :effect (and
+            (increase (total-cost) 0)
+            (not (playerMoved))
+            (not (currentRound ?r0))
+            (currentRound ?r1)
+            (probabilistic
+                {draw}
+            )
+        )
+    )
+
+    (:action redrawTile
+        :parameters (?t - tile)
+        :precondition (and (nextTile ?t))
+        :effect (and
+            (increase (total-cost) {redraw_cost})
+            (not (nextTile ?t))
+            (probabilistic
+                {draw}
+            )
+        )
+    )
+{place_actions}
+ )
+"""
+
+PLACE_ACTION = """
+    (:action place_{orientation}
+        :parameters ({parameters})
+        :precondition (and
+            (nextTile {tile})
+            {order}
+            {free}
+        )
+        :effect (and
+            (increase (total-cost) 1)
+            (not (nextTile {tile}))
+            (playerMoved)
+            {blocked}
+        )
+    )
+"""
+
+def drop_profiles(tiles: TileSet) -> list[tuple[int, list[tuple[list[tuple[int, int]], list[int], list[int]]]]]:
+    """Per tile, its weight and, per orientation, its cells and the j of the
+    lowest and of the highest cell in each column it covers"""
+    profiles = []
+    for t in tiles.values():
+        orientations = []
+        for cells in t["orientations"].values():
+            columns, _ = shape_size(cells)
+            lows = [max(j for i, j in cells if i == column) for column in range(columns)]
+            highs = [min(j for i, j in cells if i == column) for column in range(columns)]
+            orientations.append((cells, lows, highs))
+        profiles.append((t["weight"], orientations))
+    return profiles
+
+
+def play_board(
+    width: int, height: int, num_blocked: int, profiles: list
+) -> list[tuple[int, int]]:
+    """Drops random tiles from the top of the grid, without clearing rows,
+    until the next tile would exceed num_blocked cells, or no tile can be
+    dropped any more as the stack reaches the top. Each tile is dropped
+    where it leaves the fewest holes below it, then where it lands lowest,
+    except for a random drop with probability EXPLORATION. Tiles that cannot
+    be placed are redrawn. profiles are the drop_profiles of the tile set."""
+    assert num_blocked < width * height
+    tiles = range(len(profiles))
+    weights = [weight for weight, _ in profiles]
+    placeable = {k for k in tiles if weights[k] > 0 and profiles[k][1]}
+    assert placeable
+    # first free row of each column
+    heights = [0] * width
+    blocked: list[tuple[int, int]] = []
+    # tiles that do not fit on the current grid
+    stuck: set[int] = set()
+    while True:
+        k = random.choices(tiles, weights)[0]
+        if k not in placeable or k in stuck:
+            continue
+        orientations = profiles[k][1]
+        if len(blocked) + len(orientations[0][0]) > num_blocked:
+            break
+        prefix = [0]
+        for h in heights:
+            prefix.append(prefix[-1] + h)
+        # (score, x0, top row y0, orientation) of the drops inside the grid
+        drops = []
+        for orientation in orientations:
+            lows = orientation[1]
+            span = len(lows)
+            positions = width - span + 1
+            # the tile stops as soon as one of its columns hits the stack
+            landings = map(max, *(
+                [h + low for h in heights[i:i + positions]] for i, low in enumerate(lows)
+            )) if span > 1 else [h + lows[0] for h in heights]
+            base = sum(lows)
+            for x0, y0 in enumerate(landings):
+                if y0 < height:
+                    holes = span * y0 - base - prefix[x0 + span] + prefix[x0]
+                    drops.append((holes * height + y0, x0, y0, orientation))
+        if not drops:
+            stuck.add(k)
+            if stuck == placeable:
+                break
+            continue
+        stuck.clear()
+        if random.random() < EXPLORATION:
+            _, x0, y0, (cells, _, highs) = random.choice(drops)
+        else:
+            best = min(drops)[0]
+            _, x0, y0, (cells, _, highs) = random.choice([d for d in drops if d[0] == best])
+        blocked.extend((x0 + i, y0 - j) for i, j in cells)
+        for i, high in enumerate(highs):
+            heights[x0 + i] = y0 - high + 1
+    return blocked
+
+
+def populate_board(
+    fill: str, width: int, height: int, num_blocked: int, profiles: list
+) -> list[tuple[int, int]]:
+    if fill == "play":
+        return play_board(width, height, num_blocked, profiles)
+    return fill_board(width, height, num_blocked)
+
+
 PROBLEM = """
 (define (problem tetris-{width}-{height}-{blocked}-{seed})
 (:domain tetris)
@@ -40,8 +209,7 @@ PROBLEM = """
     {rounds} - round
 )
 (:init
-    {above}
-    {left}
+    {static}
     {nextRound}
     {initially_blocked}
     (currentRound rnd0)
@@ -56,13 +224,41 @@ PROBLEM = """
 """
 
 
+def place_parameters(cells: list[tuple[int, int]]) -> tuple[list[str], list[str]]:
+    """Hposition and Vposition parameters of the place action of an orientation"""
+    columns, rows = shape_size(cells)
+    # a single column or row is not numbered
+    xs = ["?x"] if columns == 1 else [f"?x{i}" for i in range(columns)]
+    ys = ["?y"] if rows == 1 else [f"?y{j}" for j in range(rows)]
+    return xs, ys
+
+
+def anchor_facts(width: int, height: int, tiles: TileSet) -> list[str]:
+    facts = []
+    for t in tiles.values():
+        for orientation, cells in t["orientations"].items():
+            columns, rows = shape_size(cells)
+            for x0, y0 in anchors(width, height, cells):
+                xs = [f"hpos{x0 + i}" for i in range(columns)]
+                ys = [f"vpos{y0 - j}" for j in range(rows)]
+                facts.append(f"(ANCHOR_{orientation} {' '.join(xs + ys)})")
+    return facts
+
+
 def generate_problem(
     seed: int,
     width: int,
     height: int,
     rounds: int,
     initially_blocked: list[tuple[int, int]],
+    tiles: TileSet = DEFAULT_TILES,
+    encoding: str = "connected",
 ) -> str:
+    if encoding == "anchors":
+        static = anchor_facts(width, height, tiles)
+    else:
+        static = [f"(ABOVE vpos{i} vpos{i-1})" for i in range(1, height)]
+        static += [f"(LEFT hpos{i-1} hpos{i})" for i in range(1, width)]
     return PROBLEM.format(
         width=width,
         height=height,
@@ -71,8 +267,7 @@ def generate_problem(
         hpositions=" ".join((f"hpos{i}" for i in range(width))),
         vpositions=" ".join((f"vpos{i}" for i in range(height))),
         rounds=" ".join((f"rnd{i}" for i in range(rounds + 1))),
-        above="\n    ".join([f"(ABOVE vpos{i} vpos{i-1})" for i in range(1, height)]),
-        left="\n    ".join([f"(LEFT hpos{i-1} hpos{i})" for i in range(1, width)]),
+        static="\n    ".join(static),
         nextRound="\n    ".join([f"(NEXT rnd{i} rnd{i+1})" for i in range(rounds)]),
         initially_blocked="\n    ".join(
             [f"(blocked hpos{x} vpos{y})" for (x, y) in initially_blocked]
@@ -81,6 +276,87 @@ def generate_problem(
     )
 
 
+def generate_place_action(
+    tile: str, orientation: str, cells: list[tuple[int, int]], encoding: str
+) -> str:
+    xs, ys = place_parameters(cells)
+    if encoding == "anchors":
+        order = [f"(ANCHOR_{orientation} {' '.join(xs + ys)})"]
+    else:
+        order = [f"(ABOVE {ys[j - 1]} {ys[j]})" for j in range(1, len(ys))]
+        order += [f"(LEFT {xs[i - 1]} {xs[i]})" for i in range(1, len(xs))]
+    cell_atoms = [f"(blocked {xs[i]} {ys[j]})" for i, j in cells]
+    return PLACE_ACTION.format(
+        orientation=orientation,
+        tile=tile,
+        parameters=f"{' '.join(xs)} - Hposition {' '.join(ys)} - Vposition",
+        order="\n            ".join(order),
+        free="\n            ".join(f"(not {atom})" for atom in cell_atoms),
+        blocked="\n            ".join(cell_atoms),
+    )
+
+
+def generate_domain(tiles: TileSet, redraw_cost: int, encoding: str = "connected") -> str:
+    total = sum(t["weight"] for t in tiles.values())
+    assert total > 0
+    if encoding == "anchors":
+        static_predicates = []
+        for t in tiles.values():
+            for orientation, cells in t["orientations"].items():
+                xs, ys = place_parameters(cells)
+                static_predicates.append(
+                    f"(ANCHOR_{orientation} {' '.join(xs)} - Hposition {' '.join(ys)} - Vposition)"
+                )
+    else:
+        static_predicates = ["(ABOVE ?i ?j - Vposition)", "(LEFT ?i ?j - Hposition)"]
+    return DOMAIN.format(
+        tiles=" ".join(tiles),
+        static_predicates="\n        ".join(static_predicates),
+        draw="\n                ".join(
+            f"{Fraction(t['weight'], total)} (nextTile {tile})"
+            for tile, t in tiles.items()
+            if t["weight"] > 0
+        ),
+        redraw_cost=redraw_cost,
+        place_actions="".join(
+            generate_place_action(tile, orientation, cells, encoding)
+            for tile, t in tiles.items()
+            for orientation, cells in t["orientations"].items()
+        ),
+    )
+
+
+def ground_place_actions(
+    width: int, height: int, tiles: TileSet, encoding: str
+) -> tuple[int, int]:
+    """Grounds the place actions as a grounder that instantiates all
+    parameters before checking the static preconditions would. Returns the
+    number of parameter tuples tried and of ground actions."""
+    above = {(y + 1, y) for y in range(height - 1)}
+    left = {(x, x + 1) for x in range(width - 1)}
+    tried = grounded = 0
+    for t in tiles.values():
+        for orientation, cells in t["orientations"].items():
+            columns, rows = shape_size(cells)
+            if encoding == "anchors":
+                facts = {
+                    tuple(x0 + i for i in range(columns)) + tuple(y0 - j for j in range(rows))
+                    for x0, y0 in anchors(width, height, cells)
+                }
+                # each fact binds all parameters at once
+                tried += len(facts)
+                grounded += len(facts)
+                continue
+            for xs in product(range(width), repeat=columns):
+                if not all((xs[i - 1], xs[i]) in left for i in range(1, columns)):
+                    tried += height**rows
+                    continue
+                for ys in product(range(height), repeat=rows):
+                    tried += 1
+                    grounded += all((ys[j - 1], ys[j]) in above for j in range(1, rows))
+    return tried, grounded
+
+
 def main():
     p = argparse.ArgumentParser()
     p.add_argument("width", type=int, help="Width of the Tetris grid")
@@ -90,14 +366,72 @@ def main():
         "--populate", type=float, help="Initial grid population ratio", default=0.0
     )
     p.add_argument("--seed", type=int, help="RNG seed", default=1734)
+    p.add_argument(
+        "--fill",
+        choices=FILLS,
+        default="columns",
+        help="Populate the grid by growing random columns from the bottom row, or by simulated play",
+    )
+    p.add_argument(
+        "--tiles", choices=list(TILE_SETS), default="default", help="Tile set"
+    )
+    p.add_argument(
+        "--redraw-cost", type=int, help="Cost of redrawing a tile", default=10
+    )
+    p.add_argument("--domain", type=str, help="Write the domain to this file")
+    p.add_argument(
+        "--encoding",
+        choices=ENCODINGS,
+        default="connected",
+        help="Encoding of the positions of the place actions",
+    )
+    p.add_argument(
+        "--stats",
+        action="store_true",
+        help="Print the ground place actions of both encodings to stderr",
+    )
+    p.add_argument(
+        "--check",
+        action="store_true",
+        help="Re-populate the grid until all tiles can be placed, redraws allowed",
+    )
+    p.add_argument(
+        "--max-tries", type=int, help="Populations tried by --check", default=100
+    )
     args = p.parse_args()
     assert args.populate >= 0.0 and args.populate < 1.0
     assert args.width >= 4 and args.height >= 4
     assert args.rounds >= 1
+    tiles = TILE_SETS[args.tiles]
+    if args.domain:
+        with open(args.domain, "w") as f:
+            f.write(generate_domain(tiles, args.redraw_cost, args.encoding))
+    if args.stats:
+        for encoding in ENCODINGS:
+            start = time.perf_counter()
+            tried, grounded = ground_place_actions(args.width, args.height, tiles, encoding)
+            print(
+                f"{encoding} encoding: {grounded} ground place actions, "
+                f"{tried} parameter tuples tried in {time.perf_counter() - start:.3f}s",
+                file=sys.stderr,
+            )
     n = int(args.populate * (args.width * args.height))
     random.seed(args.seed)
-    blocked = fill_board(args.width, args.height, n)
-    print(generate_problem(args.seed, args.width, args.height, args.rounds, blocked))
+    profiles = drop_profiles(tiles)
+    blocked = populate_board(args.fill, args.width, args.height, n, profiles)
+    if args.check:
+        engine = Engine(args.width, args.height, tiles)
+        tries = 1
+        while not engine.can_place(engine.board(blocked), args.rounds):
+            if tries == args.max_tries:
+                sys.exit(f"no population out of {tries} admits {args.rounds} tiles")
+            blocked = populate_board(args.fill, args.width, args.height, n, profiles)
+            tries += 1
+    print(
+        generate_problem(
+            args.seed, args.width, args.height, args.rounds, blocked, tiles, args.encoding
+        )
+    )
 
 
 if __name__ == "__main__":